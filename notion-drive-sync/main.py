@@ -2,15 +2,33 @@
 Google Cloud Function that syncs Notion pages to Google Drive.
 """
 import functions_framework
-from typing import Dict, Any, Optional
-import json
+from typing import Dict, Any, List, Optional
+import asyncio
+import atexit
+import base64
+import hashlib
+import io
+import logging
 import os
-from datetime import datetime
-
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from html import escape as html_escape
+
+import aiohttp
+import ciso8601
+import httpx
+import orjson
+import pytz
+from aiolimiter import AsyncLimiter
+from cachetools import TTLCache
+from requests_toolbelt import MultipartEncoder
+
+import google.auth
+from google.auth.transport.requests import Request as GoogleRequest
 from notion_client import Client as NotionClient
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseUpload
 from io import BytesIO
 
 from shared.env import (
@@ -23,10 +41,20 @@ from shared.env import (
 # Load tool-specific environment variables
 load_tool_env('notion-drive-sync')
 
-# Initialize clients
-notion = NotionClient(auth=get_notion_api_key())
+# Clients are built lazily (see _get_notion / _get_creds) so requests that
+# never need them — e.g. webhook signature rejections — skip the cost.
 DRIVE_FOLDER_ID = get_drive_folder_id()
 
+_NOTION: Optional[NotionClient] = None
+
+
+def _get_notion() -> NotionClient:
+    """Lazily create and reuse the Notion client."""
+    global _NOTION
+    if _NOTION is None:
+        _NOTION = NotionClient(auth=get_notion_api_key())
+    return _NOTION
+
 ################################################################################
 # Configuration
 ################################################################################
@@ -54,24 +82,54 @@ logging.basicConfig(
 ################################################################################
 # Google credentials & token helper
 ################################################################################
-creds, _ = google.auth.default(
-    scopes=[
-        "https://www.googleapis.com/auth/drive",
-        "https://www.googleapis.com/auth/drive.file",
-    ]
-)
+_CREDS = None
+
+
+def _get_creds():
+    """Lazily run application-default credential discovery."""
+    global _CREDS
+    if _CREDS is None:
+        _CREDS, _ = google.auth.default(
+            scopes=[
+                "https://www.googleapis.com/auth/drive",
+                "https://www.googleapis.com/auth/drive.file",
+            ]
+        )
+    return _CREDS
+
+
+_token_lock = threading.Lock()
+_token_cache: Dict[str, Any] = {"token": None, "exp": 0.0}
+
 
 def _get_access_token() -> str:
-    """Return a valid OAuth2 access token string."""
-    if not creds.valid or creds.expired:
+    """Return a valid OAuth2 access token string.
+
+    The token is cached until shortly before expiry so concurrent uploads
+    don't race each other into duplicate refresh calls.
+    """
+    if _token_cache["token"] and time.time() < _token_cache["exp"] - 60:
+        return _token_cache["token"]
+    with _token_lock:
+        # Another upload may have refreshed while we waited for the lock.
+        if _token_cache["token"] and time.time() < _token_cache["exp"] - 60:
+            return _token_cache["token"]
         logging.debug("Refreshing Google credentials …")
+        creds = _get_creds()
         creds.refresh(GoogleRequest())
-    return creds.token
+        _token_cache["token"] = creds.token
+        # creds.expiry is naive UTC; attach the zone before converting so
+        # the cache window is not skewed by the local timezone
+        _token_cache["exp"] = (
+            creds.expiry.replace(tzinfo=timezone.utc).timestamp()
+            if creds.expiry
+            else time.time() + 300
+        )
+    return _token_cache["token"]
 
 ################################################################################
 # Notion helpers
 ################################################################################
-notion = Client(auth=NOTION_API_KEY)
 
 def _extract_rich_text(rt_array: List[Dict[str, Any]]) -> str:
     return "".join(span.get("plain_text", "") for span in (rt_array or []))
@@ -90,42 +148,79 @@ def _extract_title(page: Dict[str, Any]) -> str:
 _DRIVE_UPLOAD = "https://www.googleapis.com/upload/drive/v3/files"
 _DRIVE_FILES = "https://www.googleapis.com/drive/v3/files"
 
+# Shared HTTP/2 client so consecutive uploads reuse one TCP+TLS connection
+# instead of paying a fresh handshake per request.
+_HTTP = httpx.Client(
+    http2=True,
+    timeout=900,
+    limits=httpx.Limits(max_keepalive_connections=8),
+)
+atexit.register(_HTTP.close)
 
-def _multipart_request(metadata: Dict[str, Any], filepath: str, mimetype: str) -> requests.Response:
+
+def _multipart_request(metadata: Dict[str, Any], body: bytes, mimetype: str) -> httpx.Response:
     token = _get_access_token()
-    boundary = "===============sync_part_boundary=="
 
-    with open(filepath, "rb") as fh:
-        body = (
-            f"--{boundary}\r\n"
-            "Content-Type: application/json; charset=UTF-8\r\n\r\n"
-            f"{json.dumps(metadata)}\r\n"
-            f"--{boundary}\r\n"
-            f"Content-Type: {mimetype}\r\n\r\n"
-        ).encode("utf-8") + fh.read() + f"\r\n--{boundary}--".encode("utf-8")
+    # Stream the body in small chunks straight into the socket instead of
+    # concatenating it with the boundary parts into one big buffer.
+    encoder = MultipartEncoder(
+        fields={
+            "metadata": (None, orjson.dumps(metadata).decode(), "application/json"),
+            "file": (metadata["name"], BytesIO(body), mimetype),
+        }
+    )
 
     params = {"uploadType": "multipart", "supportsAllDrives": "true"}
     headers = {
         "Authorization": f"Bearer {token}",
-        "Content-Type": f"multipart/related; boundary={boundary}",
+        "Content-Type": encoder.content_type,
+        "Content-Length": str(encoder.len),
         "User-Agent": USER_AGENT,
     }
-    logging.debug(f"Uploading file metadata={metadata} size={len(body)} bytes")
-    return requests.post(_DRIVE_UPLOAD, params=params, headers=headers, data=body, timeout=900)
+    logging.debug(f"Uploading file metadata={metadata} size={encoder.len} bytes")
+    return _HTTP.post(
+        _DRIVE_UPLOAD,
+        params=params,
+        headers=headers,
+        content=iter(lambda: encoder.read(65536), b""),
+    )
+
+
+def _find_drive_file(name: str, folder_id: str) -> Optional[Dict[str, Any]]:
+    """Look up an existing Drive file by name within a folder."""
+    query = f"name = '{name.replace(chr(39), chr(92) + chr(39))}' and '{folder_id}' in parents and trashed = false"
+    resp = _HTTP.get(
+        _DRIVE_FILES,
+        params={
+            "q": query,
+            "fields": "files(id, appProperties)",
+            "supportsAllDrives": "true",
+            "includeItemsFromAllDrives": "true",
+        },
+        headers={"Authorization": f"Bearer {_get_access_token()}", "User-Agent": USER_AGENT},
+    )
+    if not resp.is_success:
+        logging.warning("Drive file lookup failed: %s", resp.text)
+        return None
+    files = resp.json().get("files", [])
+    return files[0] if files else None
 
 
 def create_drive_file(
     name: str,
     folder_id: str,
-    filepath: str,
+    body: bytes,
     mimetype: str,
     convert_to_gdoc: bool = False,
+    app_properties: Optional[Dict[str, str]] = None,
 ) -> str:
     metadata = {"name": name, "parents": [folder_id]}
     if convert_to_gdoc:
         metadata["mimeType"] = "application/vnd.google-apps.document"
-    resp = _multipart_request(metadata, filepath, mimetype)
-    if not resp.ok:
+    if app_properties:
+        metadata["appProperties"] = app_properties
+    resp = _multipart_request(metadata, body, mimetype)
+    if not resp.is_success:
         logging.error("Drive upload failed: %s", resp.text)
         resp.raise_for_status()
     file_id = resp.json()["id"]
@@ -136,190 +231,400 @@ def create_drive_file(
 # Content generators
 ################################################################################
 
+def _parse_iso(ts: str) -> datetime:
+    """Parse a Notion ISO-8601 timestamp (handles the trailing Z natively)."""
+    return ciso8601.parse_datetime(ts)
+
+
 def convert_to_la(dt: datetime) -> str:
     if dt.tzinfo is None:
         dt = pytz.utc.localize(dt)
     return dt.astimezone(LA_TZ).strftime("%B %d, %Y %I:%M %p PT")
 
 
-def fetch_all_blocks(page_id: str, start_cursor: Optional[str] = None) -> List[Dict[str, Any]]:
-    blocks: List[Dict[str, Any]] = []
+_NOTION_API_BASE = "https://api.notion.com/v1"
+_NOTION_VERSION = "2022-06-28"
+# Bound concurrent Notion requests to stay clear of the per-integration rate limit.
+_NOTION_MAX_CONCURRENCY = 5
+# Notion allows ~3 requests/second per integration.
+_NOTION_RATE_LIMIT = 3
+
+
+class _TokenBucket:
+    """Thread-safe token bucket for the synchronous Notion client calls."""
+
+    def __init__(self, rate: float, per: float = 1.0):
+        self._rate = rate
+        self._per = per
+        self._tokens = rate
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a request token is available."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                refill = (now - self._updated) * (self._rate / self._per)
+                self._tokens = min(self._rate, self._tokens + refill)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / (self._rate / self._per)
+            time.sleep(wait)
+
+
+_NOTION_BUCKET = _TokenBucket(rate=_NOTION_RATE_LIMIT)
+
+
+async def _fetch_block_children(
+    session: aiohttp.ClientSession,
+    semaphore: asyncio.Semaphore,
+    limiter: AsyncLimiter,
+    block_id: str,
+) -> List[Dict[str, Any]]:
+    """Fetch all children of a single block, following pagination cursors.
+
+    Every request passes through the shared rate limiter; a 429 waits for
+    the server-provided Retry-After instead of failing the sync.
+    """
+    results: List[Dict[str, Any]] = []
+    cursor: Optional[str] = None
     while True:
-        res = notion.blocks.children.list(block_id=page_id, start_cursor=start_cursor)
-        blocks += res["results"]
-        if not res.get("has_more"):
-            break
-        start_cursor = res.get("next_cursor")
-    for blk in blocks:
-        if blk.get("has_children"):
-            blk["children"] = fetch_all_blocks(blk["id"])
-    return blocks
-
-
-def blocks_to_plaintext(blocks: List[Dict[str, Any]]) -> str:
-    lines: List[str] = []
-    for blk in blocks:
+        params = {"page_size": 100}
+        if cursor:
+            params["start_cursor"] = cursor
+        async with semaphore:
+            async with limiter:
+                async with session.get(
+                    f"{_NOTION_API_BASE}/blocks/{block_id}/children", params=params
+                ) as resp:
+                    if resp.status == 429:
+                        retry_after = float(resp.headers.get("Retry-After", "1"))
+                        logging.warning(
+                            "Notion 429 for block %s – backing off %.1fs", block_id, retry_after
+                        )
+                        await asyncio.sleep(retry_after)
+                        continue
+                    resp.raise_for_status()
+                    data = await resp.json()
+        results += data["results"]
+        if not data.get("has_more"):
+            return results
+        cursor = data.get("next_cursor")
+
+
+class BlockFetcher:
+    """
+    Coalesces concurrent child-block fetches into batched flushes.
+
+    Callers await ``get_children(block_id)``; requests arriving within a
+    short window are drained from a queue together and issued concurrently
+    over one keep-alive session, so N sibling fetches cost one batched
+    flush instead of N serial round-trips.
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        max_concurrency: int = _NOTION_MAX_CONCURRENCY,
+        max_wait_ms: int = 20,
+    ):
+        self._session = session
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._limiter = AsyncLimiter(_NOTION_RATE_LIMIT, 1.0)
+        self._queue: "asyncio.Queue" = asyncio.Queue()
+        self._max_wait = max_wait_ms / 1000.0
+        self._worker = asyncio.ensure_future(self._run())
+
+    async def get_children(self, block_id: str) -> List[Dict[str, Any]]:
+        """Submit a fetch and wait for the coalesced result."""
+        future = asyncio.get_event_loop().create_future()
+        await self._queue.put((block_id, future))
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_event_loop()
+        while True:
+            batch = [await self._queue.get()]
+            # Drain whatever else arrives within the coalescing window so
+            # sibling fetches flush together.
+            deadline = loop.time() + self._max_wait
+            while True:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            for block_id, future in batch:
+                asyncio.ensure_future(self._fetch_one(block_id, future))
+
+    async def _fetch_one(self, block_id: str, future: "asyncio.Future") -> None:
+        try:
+            children = await _fetch_block_children(
+                self._session, self._semaphore, self._limiter, block_id
+            )
+            future.set_result(children)
+        except Exception as exc:
+            future.set_exception(exc)
+
+    def close(self) -> None:
+        self._worker.cancel()
+
+
+async def _fetch_subtree(fetcher: BlockFetcher, block_id: str) -> List[Dict[str, Any]]:
+    """Fetch a block's children and recurse into nested blocks concurrently."""
+    children = await fetcher.get_children(block_id)
+    nested = [blk for blk in children if blk.get("has_children")]
+    if nested:
+
+        async def _fill(blk: Dict[str, Any]) -> None:
+            blk["children"] = await _fetch_subtree(fetcher, blk["id"])
+
+        await asyncio.gather(*(_fill(blk) for blk in nested))
+    return children
+
+
+async def fetch_all_blocks_async(page_id: str) -> List[Dict[str, Any]]:
+    """
+    Fetch the full block tree of a page.
+
+    Child fetches are funneled through a coalescing BlockFetcher so sibling
+    requests flush together; wall time scales with tree depth instead of
+    total block count.
+    """
+    headers = {
+        "Authorization": f"Bearer {NOTION_API_KEY}",
+        "Notion-Version": _NOTION_VERSION,
+        "User-Agent": USER_AGENT,
+    }
+    async with aiohttp.ClientSession(headers=headers) as session:
+        fetcher = BlockFetcher(session)
+        try:
+            return await _fetch_subtree(fetcher, page_id)
+        finally:
+            fetcher.close()
+
+
+def fetch_all_blocks(page_id: str) -> List[Dict[str, Any]]:
+    """Synchronous wrapper around the concurrent block-tree fetch."""
+    return asyncio.run(fetch_all_blocks_async(page_id))
+
+
+def blocks_to_plaintext(blocks: List[Dict[str, Any]], out: io.StringIO) -> None:
+    """Render blocks as plain text into a shared output buffer.
+
+    An explicit stack replaces Python recursion, so deeply nested toggle
+    lists cost no interpreter frames and cannot hit the recursion limit.
+    Children are pushed in reverse so pop order matches document order.
+    """
+    stack = list(reversed(blocks))
+    while stack:
+        blk = stack.pop()
         typ = blk["type"]
         content = _extract_rich_text(blk[typ].get("rich_text", [])) if typ != "divider" else "---"
         if typ.startswith("heading_"):
-            lines.append(content.upper())
+            out.write(content.upper())
         elif typ == "bulleted_list_item":
-            lines.append(f"- {content}")
+            out.write(f"- {content}")
         elif typ == "numbered_list_item":
-            lines.append(f"1. {content}")
+            out.write(f"1. {content}")
         elif typ == "quote":
-            lines.append(f"> {content}")
+            out.write(f"> {content}")
         elif typ == "code":
-            lines.append(content)
+            out.write(content)
         elif typ == "divider":
-            lines.append("\n---\n")
+            out.write("\n---\n")
         else:  # paragraph or others
-            lines.append(content)
+            out.write(content)
+        out.write("\n")
+        if blk.get("children"):
+            stack.extend(reversed(blk["children"]))
+
+
+# Open/close tag pairs for the simple text-bearing block types; divider is
+# special-cased in blocks_to_html.
+_HTML_TAGS: Dict[str, tuple] = {
+    "paragraph": ("<p>", "</p>"),
+    "heading_1": ("<h1>", "</h1>"),
+    "heading_2": ("<h2>", "</h2>"),
+    "heading_3": ("<h3>", "</h3>"),
+    "bulleted_list_item": ("<ul><li>", "</li></ul>"),
+    "numbered_list_item": ("<ol><li>", "</li></ol>"),
+    "code": ("<pre><code>", "</code></pre>"),
+    "quote": ("<blockquote>", "</blockquote>"),
+}
+
+
+def blocks_to_html(blocks: List[Dict[str, Any]], out: io.StringIO) -> None:
+    """Render blocks as HTML into a shared output buffer (see blocks_to_plaintext).
+
+    Each block's element is self-contained (children render after the
+    closing tag), so the same pre-order stack walk applies.
+    """
+    stack = list(reversed(blocks))
+    while stack:
+        blk = stack.pop()
+        typ = blk["type"]
+        if typ == "divider":
+            out.write("<hr />\n")
+        else:
+            tags = _HTML_TAGS.get(typ)
+            if tags:
+                out.write(tags[0])
+                out.write(html_escape(_extract_rich_text(blk[typ].get("rich_text", []))))
+                out.write(tags[1])
+                out.write("\n")
         if blk.get("children"):
-            lines.append(blocks_to_plaintext(blk["children"]))
-    return "\n".join(lines)
+            stack.extend(reversed(blk["children"]))
 
 
-def html_escape(s: str) -> str:
-    return (
-        s.replace("&", "&amp;")
-        .replace("<", "&lt;")
-        .replace(">", "&gt;")
-        .replace("\"", "&quot;")
-        .replace("'", "&#39;")
-    )
+def _prop_number(prop: Dict[str, Any]) -> Optional[str]:
+    num = prop.get("number")
+    return str(num) if num is not None else None
 
 
-def blocks_to_html(blocks: List[Dict[str, Any]]) -> str:
-    parts: List[str] = []
-    for blk in blocks:
-        typ = blk["type"]
-        if typ == "paragraph":
-            parts.append(f"<p>{html_escape(_extract_rich_text(blk[typ]['rich_text']))}</p>")
-        elif typ == "heading_1":
-            parts.append(f"<h1>{html_escape(_extract_rich_text(blk[typ]['rich_text']))}</h1>")
-        elif typ == "heading_2":
-            parts.append(f"<h2>{html_escape(_extract_rich_text(blk[typ]['rich_text']))}</h2>")
-        elif typ == "heading_3":
-            parts.append(f"<h3>{html_escape(_extract_rich_text(blk[typ]['rich_text']))}</h3>")
-        elif typ == "bulleted_list_item":
-            parts.append(f"<ul><li>{html_escape(_extract_rich_text(blk[typ]['rich_text']))}</li></ul>")
-        elif typ == "numbered_list_item":
-            parts.append(f"<ol><li>{html_escape(_extract_rich_text(blk[typ]['rich_text']))}</li></ol>")
-        elif typ == "code":
-            parts.append(f"<pre><code>{html_escape(_extract_rich_text(blk[typ]['rich_text']))}</code></pre>")
-        elif typ == "quote":
-            parts.append(f"<blockquote>{html_escape(_extract_rich_text(blk[typ]['rich_text']))}</blockquote>")
-        elif typ == "divider":
-            parts.append("<hr />")
-        if blk.get("children"):
-            parts.append(blocks_to_html(blk["children"]))
-    return "\n".join(parts)
+def _prop_select(prop: Dict[str, Any]) -> Optional[str]:
+    sel = prop.get("select")
+    return sel.get("name") if sel else None
+
+
+def _prop_multi_select(prop: Dict[str, Any]) -> Optional[str]:
+    items = prop.get("multi_select", [])
+    return ", ".join(item.get("name", "") for item in items) if items else None
+
+
+def _prop_date(prop: Dict[str, Any]) -> Optional[str]:
+    date_obj = prop.get("date")
+    if not date_obj:
+        return None
+    start = date_obj.get("start")
+    end = date_obj.get("end")
+    if end:
+        return f"{start} to {end}"
+    return start
+
+
+def _prop_people(prop: Dict[str, Any]) -> Optional[str]:
+    people = prop.get("people", [])
+    names = [person.get("name") or person.get("id", "Unknown") for person in people]
+    return ", ".join(names) if names else None
+
+
+def _prop_files(prop: Dict[str, Any]) -> Optional[str]:
+    files = prop.get("files", [])
+    file_names = []
+    for file_obj in files:
+        name = file_obj.get("name")
+        if name:
+            file_names.append(name)
+        elif file_obj.get("file"):
+            # External file
+            url = file_obj.get("file", {}).get("url", "")
+            file_names.append(url.split("/")[-1] if url else "Unnamed file")
+    return ", ".join(file_names) if file_names else None
+
+
+def _prop_formula(prop: Dict[str, Any]) -> Optional[str]:
+    formula = prop.get("formula", {})
+    formula_type = formula.get("type")
+    if formula_type == "string":
+        return formula.get("string")
+    elif formula_type == "number":
+        num = formula.get("number")
+        return str(num) if num is not None else None
+    elif formula_type == "boolean":
+        return "Yes" if formula.get("boolean") else "No"
+    elif formula_type == "date":
+        date_obj = formula.get("date")
+        return date_obj.get("start") if date_obj else None
+    return None
+
+
+def _prop_relation(prop: Dict[str, Any]) -> Optional[str]:
+    relations = prop.get("relation", [])
+    return f"{len(relations)} related items" if relations else None
+
+
+def _prop_rollup(prop: Dict[str, Any]) -> Optional[str]:
+    rollup = prop.get("rollup", {})
+    rollup_type = rollup.get("type")
+    if rollup_type == "number":
+        num = rollup.get("number")
+        return str(num) if num is not None else None
+    elif rollup_type == "array":
+        array = rollup.get("array", [])
+        return f"{len(array)} items" if array else None
+    return None
+
+
+def _prop_user(key: str):
+    def _extract(prop: Dict[str, Any]) -> str:
+        user = prop.get(key, {})
+        return user.get("name") or user.get("id", "Unknown")
+
+    return _extract
+
+
+def _prop_timestamp(key: str):
+    def _extract(prop: Dict[str, Any]) -> str:
+        return convert_to_la(_parse_iso(prop.get(key, "")))
+
+    return _extract
+
+
+def _prop_status(prop: Dict[str, Any]) -> Optional[str]:
+    status = prop.get("status")
+    return status.get("name") if status else None
+
+
+# Dispatch table: property type -> handler. One dict lookup replaces the
+# former ~20-branch if/elif ladder per property.
+_PROP_HANDLERS: Dict[str, Any] = {
+    "title": lambda p: _extract_rich_text(p.get("title", [])),
+    "rich_text": lambda p: _extract_rich_text(p.get("rich_text", [])),
+    "number": _prop_number,
+    "select": _prop_select,
+    "multi_select": _prop_multi_select,
+    "date": _prop_date,
+    "checkbox": lambda p: "Yes" if p.get("checkbox") else "No",
+    "url": lambda p: p.get("url"),
+    "email": lambda p: p.get("email"),
+    "phone_number": lambda p: p.get("phone_number"),
+    "people": _prop_people,
+    "files": _prop_files,
+    "formula": _prop_formula,
+    "relation": _prop_relation,
+    "rollup": _prop_rollup,
+    "created_time": _prop_timestamp("created_time"),
+    "last_edited_time": _prop_timestamp("last_edited_time"),
+    "created_by": _prop_user("created_by"),
+    "last_edited_by": _prop_user("last_edited_by"),
+    "status": _prop_status,
+}
 
 
 def _extract_property_value(prop: Dict[str, Any]) -> Optional[str]:
     """Extract a readable string value from any Notion property type."""
     if not prop:
         return None
-    
+
     prop_type = prop.get("type")
     if not prop_type:
         return None
-    
+
+    handler = _PROP_HANDLERS.get(prop_type)
+    if handler is None:
+        return None
+
     try:
-        if prop_type == "title":
-            return _extract_rich_text(prop.get("title", []))
-        elif prop_type == "rich_text":
-            return _extract_rich_text(prop.get("rich_text", []))
-        elif prop_type == "number":
-            num = prop.get("number")
-            return str(num) if num is not None else None
-        elif prop_type == "select":
-            sel = prop.get("select")
-            return sel.get("name") if sel else None
-        elif prop_type == "multi_select":
-            items = prop.get("multi_select", [])
-            return ", ".join(item.get("name", "") for item in items) if items else None
-        elif prop_type == "date":
-            date_obj = prop.get("date")
-            if not date_obj:
-                return None
-            start = date_obj.get("start")
-            end = date_obj.get("end")
-            if end:
-                return f"{start} to {end}"
-            return start
-        elif prop_type == "checkbox":
-            return "Yes" if prop.get("checkbox") else "No"
-        elif prop_type == "url":
-            return prop.get("url")
-        elif prop_type == "email":
-            return prop.get("email")
-        elif prop_type == "phone_number":
-            return prop.get("phone_number")
-        elif prop_type == "people":
-            people = prop.get("people", [])
-            names = []
-            for person in people:
-                name = person.get("name") or person.get("id", "Unknown")
-                names.append(name)
-            return ", ".join(names) if names else None
-        elif prop_type == "files":
-            files = prop.get("files", [])
-            file_names = []
-            for file_obj in files:
-                name = file_obj.get("name")
-                if name:
-                    file_names.append(name)
-                elif file_obj.get("file"):
-                    # External file
-                    url = file_obj.get("file", {}).get("url", "")
-                    file_names.append(url.split("/")[-1] if url else "Unnamed file")
-            return ", ".join(file_names) if file_names else None
-        elif prop_type == "formula":
-            formula = prop.get("formula", {})
-            formula_type = formula.get("type")
-            if formula_type == "string":
-                return formula.get("string")
-            elif formula_type == "number":
-                num = formula.get("number")
-                return str(num) if num is not None else None
-            elif formula_type == "boolean":
-                return "Yes" if formula.get("boolean") else "No"
-            elif formula_type == "date":
-                date_obj = formula.get("date")
-                return date_obj.get("start") if date_obj else None
-        elif prop_type == "relation":
-            relations = prop.get("relation", [])
-            return f"{len(relations)} related items" if relations else None
-        elif prop_type == "rollup":
-            rollup = prop.get("rollup", {})
-            rollup_type = rollup.get("type")
-            if rollup_type == "number":
-                num = rollup.get("number")
-                return str(num) if num is not None else None
-            elif rollup_type == "array":
-                array = rollup.get("array", [])
-                return f"{len(array)} items" if array else None
-        elif prop_type == "created_time":
-            return convert_to_la(datetime.fromisoformat(prop.get("created_time", "").replace("Z", "+00:00")))
-        elif prop_type == "last_edited_time":
-            return convert_to_la(datetime.fromisoformat(prop.get("last_edited_time", "").replace("Z", "+00:00")))
-        elif prop_type == "created_by":
-            user = prop.get("created_by", {})
-            return user.get("name") or user.get("id", "Unknown")
-        elif prop_type == "last_edited_by":
-            user = prop.get("last_edited_by", {})
-            return user.get("name") or user.get("id", "Unknown")
-        elif prop_type == "status":
-            status = prop.get("status")
-            return status.get("name") if status else None
-    
+        return handler(prop)
     except Exception as e:
         logging.warning(f"Error extracting property {prop_type}: {e}")
         return None
-    
-    return None
 
 
 def build_metadata(page: Dict[str, Any]) -> List[str]:
@@ -356,11 +661,11 @@ def build_metadata(page: Dict[str, Any]) -> List[str]:
     metadata_lines.append("== Page Info ==")
     
     if page.get("created_time"):
-        created = convert_to_la(datetime.fromisoformat(page["created_time"].replace("Z", "+00:00")))
+        created = convert_to_la(_parse_iso(page["created_time"]))
         metadata_lines.append(f"Created: {created}")
     
     if page.get("last_edited_time"):
-        edited = convert_to_la(datetime.fromisoformat(page["last_edited_time"].replace("Z", "+00:00")))
+        edited = convert_to_la(_parse_iso(page["last_edited_time"]))
         metadata_lines.append(f"Last Edited: {edited}")
     
     if page.get("created_by"):
@@ -384,24 +689,161 @@ def assemble_html(metadata_lines: List[str], blocks: List[Dict[str, Any]]) -> st
         "body{font-family:Arial,Helvetica,sans-serif;line-height:1.6;padding:20px;max-width:800px;margin:auto;}"  # noqa: E501
         "h1,h2,h3{font-weight:bold;}pre{background:#f0f0f0;padding:10px;}blockquote{border-left:3px solid #ccc;padding-left:15px;color:#555;}"  # noqa: E501
     )
-    return (
+    buf = io.StringIO()
+    buf.write(
         "<!DOCTYPE html><html><head><meta charset='utf-8'><title>" + html_escape(metadata_lines[0]) + "</title>"
         f"<style>{style}</style></head><body><div class='metadata'>{body_meta}</div>"
-        + blocks_to_html(blocks)
-        + "</body></html>"
     )
+    blocks_to_html(blocks, buf)
+    buf.write("</body></html>")
+    return buf.getvalue()
 
 ################################################################################
 # Utility
 ################################################################################
 
+# Strip anything that is not alphanumeric/underscore or filename-safe
+# punctuation; the compiled pattern runs in C instead of a per-character
+# Python loop.
+_SANITIZE_RE = re.compile(r"[^\w ._\-()]", re.UNICODE)
+
+
 def sanitize(name: str) -> str:
-    return "".join(c for c in name if c.isalnum() or c in " ._-()")[:200]
+    return _SANITIZE_RE.sub("", name)[:200]
+
+################################################################################
+# Sync worker
+################################################################################
+
+# Notion webhooks fire in bursts for the same page; title and metadata are
+# deterministic given (page_id, last_edited_time), so cache them briefly.
+_META_CACHE: TTLCache = TTLCache(maxsize=128, ttl=300)
+
+
+def _retrieve_page(page_id: str) -> Dict[str, Any]:
+    """Retrieve page metadata through the shared rate limiter."""
+    _NOTION_BUCKET.acquire()
+    return _get_notion().pages.retrieve(page_id)
+
+
+def _perform_sync(page_id: str) -> None:
+    """Fetch, render and upload a single page. Runs in the worker invocation."""
+    try:
+        logging.debug("Sync started for page %s", page_id)
+        # The page retrieve and the block-tree fetch are independent; firing
+        # them together removes one full round-trip from the critical path.
+        with ThreadPoolExecutor(max_workers=2) as fetch_pool:
+            page_future = fetch_pool.submit(_retrieve_page, page_id)
+            blocks_future = fetch_pool.submit(fetch_all_blocks, page_id)
+            page = page_future.result()
+            blocks = blocks_future.result()
+
+        meta_key = (page_id, page.get("last_edited_time", ""))
+        cached = _META_CACHE.get(meta_key)
+        if cached:
+            title, metadata_lines = cached
+        else:
+            title = _extract_title(page)
+            metadata_lines = build_metadata(page)
+            _META_CACHE[meta_key] = (title, metadata_lines)
+
+        # ----------------------------- Render ---------------------------
+        # Render straight to bytes; the uploads read from memory, so
+        # there is no temp-file round-trip through disk.
+        body_buf = io.StringIO()
+        blocks_to_plaintext(blocks, body_buf)
+        body_text = body_buf.getvalue()
+        txt_content = "\n".join(metadata_lines) + "\n\n" + body_text
+        html_str = assemble_html(metadata_lines, blocks)
+
+        # --------------------------- Change check ------------------------
+        # Many webhooks fire for edits that don't change the rendered
+        # content. Hash the block-derived body (the metadata header holds
+        # a sync timestamp that always differs), compare against the hash
+        # stored on the previous TXT upload, and skip both uploads on a
+        # no-op.
+        content_hash = hashlib.blake2b(
+            body_text.encode("utf-8"), digest_size=16
+        ).hexdigest()
+        existing = _find_drive_file(f"{sanitize(title)}.txt", DRIVE_TXT_FOLDER_ID)
+        if existing and existing.get("appProperties", {}).get("contentHash") == content_hash:
+            logging.info("Content unchanged for page '%s' – skipping uploads", title)
+            return
+        app_properties = {"contentHash": content_hash}
+
+        # ----------------------------- Upload ---------------------------
+        # The TXT and GDOC uploads are independent; running them
+        # concurrently makes the Drive phase cost max(txt, gdoc)
+        # instead of txt + gdoc.
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            txt_future = executor.submit(
+                create_drive_file,
+                f"{sanitize(title)}.txt",
+                DRIVE_TXT_FOLDER_ID,
+                txt_content.encode("utf-8"),
+                "text/plain",
+                convert_to_gdoc=False,
+                app_properties=app_properties,
+            )
+            gdoc_future = executor.submit(
+                create_drive_file,
+                sanitize(title),
+                DRIVE_GDOC_FOLDER_ID,
+                html_str.encode("utf-8"),
+                "text/html",
+                convert_to_gdoc=True,
+                app_properties=app_properties,
+            )
+            txt_future.result()
+            gdoc_id = gdoc_future.result()
+        doc_url = f"https://docs.google.com/document/d/{gdoc_id}/edit"
+
+        logging.info("Sync completed – page '%s' => %s", title, doc_url)
+
+    except Exception as exc:
+        logging.exception("Sync failed: %s", exc)
+
 
 ################################################################################
-# Cloud Function entry point
+# Cloud Function entry points
 ################################################################################
 
+# Pub/Sub topic the webhook handler enqueues sync jobs onto. When unset
+# (local runs), the sync falls back to an in-process background thread.
+SYNC_PUBSUB_TOPIC = os.environ.get("SYNC_PUBSUB_TOPIC", "")
+
+_publisher = None
+
+
+def _get_publisher():
+    """Lazily create and reuse the Pub/Sub publisher client."""
+    global _publisher
+    if _publisher is None:
+        from google.cloud import pubsub_v1
+
+        _publisher = pubsub_v1.PublisherClient()
+    return _publisher
+
+
+def _enqueue_sync(page_id: str) -> None:
+    """Publish a sync job so it runs in its own worker invocation."""
+    topic_path = _get_publisher().topic_path(
+        os.environ["GOOGLE_CLOUD_PROJECT"], SYNC_PUBSUB_TOPIC
+    )
+    future = _get_publisher().publish(topic_path, orjson.dumps({"page_id": page_id}))
+    # Block until the broker acks; the background flush thread gets
+    # CPU-throttled once the HTTP response is returned, so an unawaited
+    # publish can silently never leave the instance.
+    future.result(timeout=30)
+
+
+@functions_framework.cloud_event
+def sync_notion_worker(cloud_event) -> None:
+    """Pub/Sub-triggered worker that performs the actual sync."""
+    payload = orjson.loads(base64.b64decode(cloud_event.data["message"]["data"]))
+    _perform_sync(payload["page_id"])
+
+
 @functions_framework.http
 def sync_notion_to_drive(request):
     logging.info("\n=========== New Sync Request (v%s) ===========", APP_VERSION)
@@ -433,61 +875,21 @@ def sync_notion_to_drive(request):
     page_id = page_id.replace("-", "")  # Notion API expects stripped id
 
     # ===================================================================
-    # IMMEDIATELY RETURN SUCCESS TO PREVENT NOTION TIMEOUT
+    # Hand the sync off so we answer Notion before its webhook timeout.
+    # A Pub/Sub worker invocation is reliable after the HTTP response
+    # returns, unlike a background thread whose CPU gets throttled.
     # ===================================================================
-    import threading
-    
-    def _perform_sync():
-        """Background sync operation"""
-        try:
-            logging.debug("Background sync started for page %s", page_id)
-            page = notion.pages.retrieve(page_id)
-            title = _extract_title(page)
-            blocks = fetch_all_blocks(page_id)
-            metadata_lines = build_metadata(page)
-
-            # ----------------------------- TXT -----------------------------
-            txt_content = "\n".join(metadata_lines) + "\n\n" + blocks_to_plaintext(blocks)
-            with tempfile.NamedTemporaryFile("w", delete=False, suffix=".txt", encoding="utf-8") as tf:
-                tf.write(txt_content)
-                txt_path = tf.name
-            create_drive_file(
-                f"{sanitize(title)}.txt",
-                DRIVE_TXT_FOLDER_ID,
-                txt_path,
-                "text/plain",
-                convert_to_gdoc=False,
-            )
-
-            # ----------------------------- GDOC ----------------------------
-            html_str = assemble_html(metadata_lines, blocks)
-            with tempfile.NamedTemporaryFile("w", delete=False, suffix=".html", encoding="utf-8") as hf:
-                hf.write(html_str)
-                html_path = hf.name
-            gdoc_id = create_drive_file(
-                sanitize(title),
-                DRIVE_GDOC_FOLDER_ID,
-                html_path,
-                "text/html",
-                convert_to_gdoc=True,
-            )
-            doc_url = f"https://docs.google.com/document/d/{gdoc_id}/edit"
-
-            logging.info("Background sync completed – page '%s' => %s", title, doc_url)
-
-        except Exception as exc:
-            logging.exception("Background sync failed: %s", exc)
-
-    # Start background sync
-    sync_thread = threading.Thread(target=_perform_sync)
-    sync_thread.daemon = False  # Ensure thread completes even after response is sent
-    sync_thread.start()
+    if SYNC_PUBSUB_TOPIC:
+        _enqueue_sync(page_id)
+    else:
+        sync_thread = threading.Thread(target=_perform_sync, args=(page_id,))
+        sync_thread.daemon = False
+        sync_thread.start()
 
-    # Return immediate success response to Notion
     logging.info("Returning immediate success response to prevent Notion timeout")
     return (
-        json.dumps({
-            "status": "started", 
+        orjson.dumps({
+            "status": "started",
             "message": "Sync started successfully! Please wait 10-30 seconds for the documents to appear in your Drive folders. Check your Google Drive for the updated files."
         }),
         200,
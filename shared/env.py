@@ -6,20 +6,30 @@ from typing import Optional
 from pathlib import Path
 from dotenv import load_dotenv
 
+# In Cloud Functions (K_SERVICE is set by the platform) the environment is
+# injected at deploy time, so skip the .env filesystem scan — it only adds
+# cold-start latency there.
+_RUNNING_IN_CLOUD = os.environ.get("K_SERVICE") is not None
+
 # First, try to load from root .env
-root_env = Path(__file__).parent.parent / '.env'
-if root_env.exists():
-    load_dotenv(root_env)
+if not _RUNNING_IN_CLOUD:
+    root_env = Path(__file__).parent.parent / '.env'
+    if root_env.exists():
+        load_dotenv(root_env)
 
 # Then load tool-specific .env if it exists (this will override root values)
 def load_tool_env(tool_name: str) -> None:
     """
     Load tool-specific environment variables.
     These will override any root-level variables.
-    
+
+    No-op in Cloud Functions, where the platform injects the environment.
+
     Args:
         tool_name: Name of the tool directory (e.g., 'notion-drive-sync')
     """
+    if _RUNNING_IN_CLOUD:
+        return
     tool_env = Path(__file__).parent.parent / tool_name / '.env'
     if tool_env.exists():
         load_dotenv(tool_env, override=True)
@@ -1,224 +1,521 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 import anthropic
+import asyncio
+import hashlib
+import os
+import re
+import weakref
+from collections import defaultdict
 from datetime import datetime
+from google.api_core.exceptions import NotFound
+from google.cloud import storage
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_exponential
+
+# Back off and retry transient Claude failures (rate limits, 5xx) instead
+# of dropping the job until the next scheduler tick.
+_RETRYABLE_ERRORS = (anthropic.RateLimitError, anthropic.APIStatusError)
+
+def _claude_retrying() -> AsyncRetrying:
+    """Retry policy for Claude calls: exponential backoff, four attempts."""
+    return AsyncRetrying(
+        retry=retry_if_exception_type(_RETRYABLE_ERRORS),
+        wait=wait_exponential(multiplier=1, min=2, max=60),
+        stop=stop_after_attempt(4),
+        reraise=True,
+    )
+
+# Name of the env var holding the GCS bucket for cached Claude responses;
+# caching is disabled when unset.
+_CACHE_BUCKET_ENV = "SUGGESTION_CACHE_BUCKET"
+
+# Model tiers: small prompts route to Haiku at a fraction of Sonnet's cost;
+# jobs can pin a model explicitly via their "model" field.
+_HAIKU_MODEL = "claude-3-haiku-20240307"
+_SONNET_MODEL = "claude-3-5-sonnet-20241022"
+_HAIKU_PROMPT_CHARS = 20_000
+
+def _select_model(formatted_blocks: str, formatted_messages: str) -> str:
+    """Pick a model tier from the formatted prompt size."""
+    if len(formatted_blocks) + len(formatted_messages) < _HAIKU_PROMPT_CHARS:
+        return _HAIKU_MODEL
+    return _SONNET_MODEL
+
+# One split on the field delimiters yields an alternating
+# [field name, value, ...] list per suggestion, so each field is located in
+# a single pass and missing or reordered fields degrade gracefully.
+_FIELD_RE = re.compile(
+    r"\*\*(Source Message Link|Thread Context|Triggering Text|Conflicting Block ID"
+    r"|Conflicting Text in Block|Suggested Edit|Reasoning|Confidence Score):\*\*"
+)
+
+# All field cleanup in one C-level strip pass: whitespace, markdown bullet
+# leftovers, backticks and quotes.
+_STRIP = " \t\n\r*`\"'"
+
+_FIELD_KEYS = {
+    "Source Message Link": "source_message_link",
+    "Thread Context": "thread_context",
+    "Triggering Text": "triggering_text",
+    "Conflicting Block ID": "block_id",
+    "Conflicting Text in Block": "conflicting_text",
+    "Suggested Edit": "suggested_edit",
+    "Reasoning": "reasoning",
+    "Confidence Score": "confidence_score",
+}
+
+SYSTEM_PROMPT = "You are an expert Technical Program Manager analyzing Slack messages for potential updates to Notion documentation."
+
+# Static instruction scaffold, kept byte-identical across calls so Anthropic
+# prompt caching can serve it at the cached-token rate. The dynamic Notion
+# blocks and Slack messages are appended as a separate, uncached content
+# block in _build_message_content.
+_PROMPT_PREFIX = """
+**ROLE AND GOAL:**
+You are an expert Technical Program Manager analyzing Slack messages and their thread replies to identify potential updates needed in Notion documentation. Your goal is to identify conflicts, new information, or outdated content.
+
+**YOUR TASK:**
+Carefully analyze each Slack message and its thread replies, comparing them against the Notion blocks. Pay special attention to threaded conversations as they often contain important clarifications, corrections, or updates. Identify messages that contain:
+1. New information not present in the documentation
+2. Updates to existing information
+3. Direct conflicts with documented information
+4. Important clarifications or corrections found in thread replies
+5. Consensus or final decisions reached in thread discussions
+
+**RULES:**
+1. Focus on factual conflicts or definitive updates only
+2. Each suggestion must reference a specific BLOCK_ID
+3. Consider the full context of threaded conversations
+4. Pay special attention to thread conclusions and consensus
+5. Provide high confidence suggestions only
+6. Consider context and avoid superficial changes
+
+**REQUIRED OUTPUT FORMAT:**
+For each suggestion, provide:
+
+**Suggestion N**
+* **Source Message Link:** `<Link to the Slack message>`
+* **Thread Context:** `<Brief summary of relevant thread discussion if applicable>`
+* **Triggering Text:** "`<Quote the exact phrase from Slack.>`"
+* **Conflicting Block ID:** "`<The exact BLOCK_ID of the outdated Notion block.>`"
+* **Conflicting Text in Block:** "`<Quote the specific sentence from the Notion block's content.>`"
+* **Suggested Edit:** "`<Write the new, updated text for the block.>`"
+* **Reasoning:** `<Explain why this is a necessary update in one sentence.>`
+* **Confidence Score:** `<High/Medium/Low>`
+
+If no valid suggestions are found, respond with "No suggestions found."
+"""
+
+# Template for the dynamic (uncached) tail of the user message; the literal
+# is assembled once at import instead of on every call.
+_PROMPT_DYNAMIC_TEMPLATE = (
+    "**PRIMARY CONTEXT: The Source of Truth (Notion Blocks)**\n"
+    "{formatted_blocks}\n\n"
+    "**INPUT DATA: Recent Slack Messages and Threads**\n"
+    "{formatted_messages}"
+)
+
+# Structured system param so the system prompt joins the cached prefix.
+_SYSTEM_BLOCKS = [{"type": "text", "text": SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}]
+
+class ResponseCache:
+    """
+    Content-addressed cache of Claude responses in a GCS bucket.
+
+    Keyed by a hash of the full prompt, so a scheduler run against an
+    unchanged Notion page and Slack window costs one GCS read instead of a
+    multi-second Claude call.
+    """
+
+    def __init__(self, bucket_name: str):
+        self._bucket = storage.Client().bucket(bucket_name)
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response text for a prompt hash, or None."""
+        try:
+            return self._bucket.blob(f"claude-responses/{key}").download_as_text()
+        except NotFound:
+            return None
+        except Exception as e:
+            print(f"Error reading response cache: {e}")
+            return None
+
+    def put(self, key: str, response: str) -> None:
+        """Store a response under its prompt hash; failures only log."""
+        try:
+            self._bucket.blob(f"claude-responses/{key}").upload_from_string(response)
+        except Exception as e:
+            print(f"Error writing response cache: {e}")
+
+
+_RESPONSE_CACHE: Optional[ResponseCache] = None
+
+def _get_response_cache() -> Optional[ResponseCache]:
+    """Lazily build the response cache when a bucket is configured."""
+    global _RESPONSE_CACHE
+    bucket_name = os.environ.get(_CACHE_BUCKET_ENV)
+    if bucket_name and _RESPONSE_CACHE is None:
+        _RESPONSE_CACHE = ResponseCache(bucket_name)
+    return _RESPONSE_CACHE
+
+
+# One AsyncAnthropic client per event loop. Each warm invocation runs its
+# own asyncio.run loop, and an httpx pool whose connections were opened
+# under a previous, now-closed loop raises "Event loop is closed" when
+# reused; keying by loop shares the pool within an invocation while never
+# crossing loops. Entries vanish with their loop via the weak keys.
+_CLIENTS: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+def get_client(api_key: str) -> anthropic.AsyncAnthropic:
+    """
+    Return the AsyncAnthropic client for the running event loop.
+
+    Must be called from within a coroutine; the client (and its httpx
+    connection pool) is shared by every Claude call on the same loop.
+    """
+    loop = asyncio.get_running_loop()
+    client = _CLIENTS.get(loop)
+    if client is None:
+        client = anthropic.AsyncAnthropic(
+            api_key=api_key,
+            timeout=anthropic.Timeout(connect=5.0, read=60.0, write=10.0, pool=5.0),
+        )
+        _CLIENTS[loop] = client
+    return client
+
 
 class AIAnalyzer:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, thread_aware: bool = True):
         """
         Initialize the Claude AI client.
-        
+
         Args:
             api_key: Anthropic API key
+            thread_aware: Group Slack messages by thread in prompts; when
+                False, messages render as a flat chronological list
         """
-        self.client = anthropic.Client(api_key=api_key)
-        
-    def generate_suggestions(self, notion_blocks: List[Dict], slack_messages: List[Dict]) -> List[Dict]:
+        self._api_key = api_key
+        self.thread_aware = thread_aware
+
+    @property
+    def client(self) -> anthropic.AsyncAnthropic:
+        """The AsyncAnthropic client bound to the current event loop."""
+        return get_client(self._api_key)
+
+    async def astream_suggestions(self, notion_blocks: List[Dict], slack_messages: List[Dict], model: Optional[str] = None):
         """
-        Generate suggestions for document updates based on Slack messages.
-        
+        Stream suggestions as Claude generates them.
+
+        Suggestion blocks are parsed and yielded as soon as their closing
+        delimiter arrives, so callers can post the first suggestion to Slack
+        while later ones are still being generated.
+
         Args:
             notion_blocks: List of Notion blocks with their content
             slack_messages: List of Slack messages to analyze
-            
-        Returns:
-            List of suggestions with block IDs and proposed changes
+            model: Model override; defaults to a size-based tier selection
+
+        Yields:
+            Suggestion dicts with block IDs and proposed changes
         """
         # Format blocks and messages for the prompt
         formatted_blocks = self._format_blocks(notion_blocks)
         formatted_messages = self._format_messages(slack_messages)
-        
-        # Construct the prompt
-        prompt = self._construct_prompt(formatted_blocks, formatted_messages)
-        
+        model = model or _select_model(formatted_blocks, formatted_messages)
+
+        # Construct the prompt content blocks
+        content = self._build_message_content(formatted_blocks, formatted_messages)
+
+        # Serve an identical prompt from the response cache when configured.
+        # The resolved model is part of the key so a job repinned to a
+        # different tier never gets another tier's cached answer.
+        cache = _get_response_cache()
+        cache_key = None
+        if cache:
+            cache_key = hashlib.sha256(
+                "\n".join([model, content[0]["text"], content[1]["text"]]).encode("utf-8")
+            ).hexdigest()
+            cached = await asyncio.to_thread(cache.get, cache_key)
+            if cached is not None:
+                for suggestion in self._parse_suggestions(cached):
+                    yield suggestion
+                return
+
+        # Suggestions already yielded are skipped if a transient failure
+        # forces a retry mid-stream, so callers never see duplicates.
+        emitted = 0
         try:
-            # Call Claude API
-            response = self.client.messages.create(
-                model="claude-3-sonnet-20240229",
-                max_tokens=4000,
-                temperature=0.0,  # Use deterministic output
-                system="You are an expert Technical Program Manager analyzing Slack messages for potential updates to Notion documentation.",
-                messages=[{"role": "user", "content": prompt}]
-            )
-            
-            # Parse the structured response
-            suggestions = self._parse_suggestions(response.content)
-            return suggestions
-            
+            async for attempt in _claude_retrying():
+                with attempt:
+                    buffer = ""
+                    pieces = []
+                    count = 0
+                    async with self.client.messages.stream(
+                        model=model,
+                        max_tokens=4000,
+                        temperature=0.0,  # Use deterministic output
+                        system=_SYSTEM_BLOCKS,
+                        messages=[{"role": "user", "content": content}]
+                    ) as stream:
+                        async for text in stream.text_stream:
+                            buffer += text
+                            pieces.append(text)
+                            # A suggestion block is complete once the next
+                            # "**Suggestion" header arrives after it.
+                            while True:
+                                start = buffer.find("**Suggestion")
+                                if start == -1:
+                                    break
+                                end = buffer.find("**Suggestion", start + 1)
+                                if end == -1:
+                                    break
+                                for suggestion in self._parse_suggestions(buffer[start:end]):
+                                    count += 1
+                                    if count > emitted:
+                                        emitted = count
+                                        yield suggestion
+                                buffer = buffer[end:]
+                        # Flush whatever remains after the stream ends (the
+                        # final suggestion, or "No suggestions found.").
+                        for suggestion in self._parse_suggestions(buffer):
+                            count += 1
+                            if count > emitted:
+                                emitted = count
+                                yield suggestion
+
+                    if cache and cache_key:
+                        await asyncio.to_thread(cache.put, cache_key, "".join(pieces))
+
         except Exception as e:
-            print(f"Error generating suggestions: {e}")
-            return []
+            print(f"Error generating suggestions ({type(e).__name__}): {e}")
+
+    async def agenerate_suggestions(self, notion_blocks: List[Dict], slack_messages: List[Dict], model: Optional[str] = None) -> List[Dict]:
+        """
+        Generate suggestions for document updates based on Slack messages.
+
+        Collects the streaming variant into a list for callers that need the
+        full set at once.
+
+        Args:
+            notion_blocks: List of Notion blocks with their content
+            slack_messages: List of Slack messages to analyze
+            model: Model override; defaults to a size-based tier selection
+
+        Returns:
+            List of suggestions with block IDs and proposed changes
+        """
+        return [s async for s in self.astream_suggestions(notion_blocks, slack_messages, model)]
+
+    def generate_suggestions(self, notion_blocks: List[Dict], slack_messages: List[Dict]) -> List[Dict]:
+        """Synchronous wrapper around agenerate_suggestions for non-async callers."""
+        return asyncio.run(self.agenerate_suggestions(notion_blocks, slack_messages))
+
+    def build_request(self, notion_blocks: List[Dict], slack_messages: List[Dict], custom_id: str, model: Optional[str] = None) -> Dict:
+        """
+        Build a Message Batches API request for one monitoring job.
+
+        Batched requests cost half the standard token rate, which suits the
+        scheduler-driven workload where nobody is waiting on a single response.
+
+        Args:
+            notion_blocks: List of Notion blocks with their content
+            slack_messages: List of Slack messages to analyze
+            custom_id: Identifier used to match the batch result back to its job
+            model: Model override; defaults to a size-based tier selection
+
+        Returns:
+            Request dict for client.messages.batches.create
+        """
+        formatted_blocks = self._format_blocks(notion_blocks)
+        formatted_messages = self._format_messages(slack_messages)
+        content = self._build_message_content(formatted_blocks, formatted_messages)
+        return {
+            "custom_id": custom_id,
+            "params": {
+                "model": model or _select_model(formatted_blocks, formatted_messages),
+                "max_tokens": 4000,
+                "temperature": 0.0,
+                "system": _SYSTEM_BLOCKS,
+                "messages": [{"role": "user", "content": content}],
+            },
+        }
+
+    async def asubmit_batch(self, requests: List[Dict]) -> str:
+        """
+        Submit all job prompts as one message batch.
+
+        Batches can take minutes to an hour, well past the function's
+        timeout, so this only submits; a later invocation collects the
+        results via aretrieve_batch_results with the returned ID.
+
+        Args:
+            requests: Request dicts from build_request
+
+        Returns:
+            The batch ID to retrieve results with
+        """
+        batch = await self.client.messages.batches.create(requests=requests)
+        return batch.id
+
+    async def aretrieve_batch_results(self, batch_id: str) -> Optional[Dict[str, List[Dict]]]:
+        """
+        Fetch the results of a previously submitted message batch.
+
+        Args:
+            batch_id: Batch ID returned by asubmit_batch
+
+        Returns:
+            Dict mapping each custom_id to its parsed suggestions, or None
+            while the batch is still processing
+        """
+        batch = await self.client.messages.batches.retrieve(batch_id)
+        if batch.processing_status != "ended":
+            return None
+
+        results: Dict[str, List[Dict]] = {}
+        async for entry in await self.client.messages.batches.results(batch_id):
+            if entry.result.type == "succeeded":
+                results[entry.custom_id] = self._parse_suggestions(entry.result.message.content[0].text)
+            else:
+                print(f"Batch request {entry.custom_id} did not succeed: {entry.result.type}")
+                results[entry.custom_id] = []
+        return results
             
     def _format_blocks(self, blocks: List[Dict]) -> str:
         """Format Notion blocks for the prompt."""
-        formatted = []
-        for block in blocks:
-            formatted.append(
+        return "\n---\n".join(
+            [
                 f"BLOCK_ID: {block['id']}\n"
                 f"TYPE: {block['type']}\n"
                 f"CONTENT: {block['content']}\n"
-            )
-        return "\n---\n".join(formatted)
+                for block in blocks
+            ]
+        )
         
     def _format_messages(self, messages: List[Dict]) -> str:
         """Format Slack messages for the prompt, preserving thread context."""
         formatted = []
-        
-        # Group messages by thread
-        threads: Dict[str, List[Dict]] = {}
+
+        # Convert every timestamp once up front instead of constructing a
+        # datetime per formatting site.
+        iso_times = {
+            msg["ts"]: datetime.fromtimestamp(float(msg["ts"])).isoformat()
+            for msg in messages
+        }
+
+        # Non-thread-aware analyzers render a flat chronological list
+        if not self.thread_aware:
+            return "\n---\n".join(
+                f"MESSAGE - {iso_times[msg['ts']]}\n"
+                f"LINK: {msg.get('permalink', 'N/A')}\n"
+                f"TEXT: {msg.get('text', '')}\n"
+                for msg in messages
+            )
+
+        # Group messages by thread: replies bucket into a defaultdict (one
+        # lookup per message) and parents live in their own dict, avoiding
+        # the O(k) list insert(0, ...) per parent
+        threads: Dict[str, List[Dict]] = defaultdict(list)
+        parents: Dict[str, Dict] = {}
         standalone_messages: List[Dict] = []
-        
+
         for msg in messages:
             if msg.get("is_thread_reply"):
-                parent_ts = msg.get("parent_ts")
-                if parent_ts not in threads:
-                    threads[parent_ts] = []
-                threads[parent_ts].append(msg)
+                threads[msg.get("parent_ts")].append(msg)
             elif msg.get("thread_ts"):
                 # This is a parent message with replies
-                if msg["ts"] not in threads:
-                    threads[msg["ts"]] = []
-                threads[msg["ts"]].insert(0, msg)  # Put parent first
+                parents[msg["ts"]] = msg
             else:
                 # Standalone message
                 standalone_messages.append(msg)
+
+        # Pair each reply list with its parent, in chronological order; a
+        # parent whose replies were not fetched still renders as a thread
+        thread_groups = []
+        for ts, replies in threads.items():
+            replies.sort(key=lambda r: float(r["ts"]))
+            parent = parents.pop(ts, None)
+            if parent is None:
+                parent, replies = replies[0], replies[1:]
+            thread_groups.append((parent, replies))
+        thread_groups.extend((parent, []) for parent in parents.values())
         
-        # Format threaded conversations
-        for thread_messages in threads.values():
-            parent = thread_messages[0]  # Parent message is first
-            thread_text = [
-                f"THREAD START - {datetime.fromtimestamp(float(parent['ts'])).isoformat()}\n"
-                f"LINK: {parent.get('permalink', 'N/A')}\n"
-                f"PARENT MESSAGE: {parent.get('text', '')}\n"
-            ]
-            
-            # Add replies in chronological order
-            for reply in thread_messages[1:]:
-                thread_text.append(
-                    f"REPLY - {datetime.fromtimestamp(float(reply['ts'])).isoformat()}\n"
-                    f"LINK: {reply.get('permalink', 'N/A')}\n"
-                    f"TEXT: {reply.get('text', '')}\n"
-                )
-            
-            thread_text.append("THREAD END\n")
-            formatted.append("\n".join(thread_text))
-        
-        # Format standalone messages
-        for msg in standalone_messages:
+        # Format threaded conversations: one join per thread, with the
+        # replies built in a single comprehension pass
+        for parent, replies in thread_groups:
             formatted.append(
-                f"MESSAGE - {datetime.fromtimestamp(float(msg['ts'])).isoformat()}\n"
-                f"LINK: {msg.get('permalink', 'N/A')}\n"
-                f"TEXT: {msg.get('text', '')}\n"
+                "\n".join(
+                    [
+                        f"THREAD START - {iso_times[parent['ts']]}\n"
+                        f"LINK: {parent.get('permalink', 'N/A')}\n"
+                        f"PARENT MESSAGE: {parent.get('text', '')}\n"
+                    ]
+                    + [
+                        f"REPLY - {iso_times[reply['ts']]}\n"
+                        f"LINK: {reply.get('permalink', 'N/A')}\n"
+                        f"TEXT: {reply.get('text', '')}\n"
+                        for reply in replies
+                    ]
+                    + ["THREAD END\n"]
+                )
             )
-        
+
+        # Format standalone messages
+        formatted.extend(
+            f"MESSAGE - {iso_times[msg['ts']]}\n"
+            f"LINK: {msg.get('permalink', 'N/A')}\n"
+            f"TEXT: {msg.get('text', '')}\n"
+            for msg in standalone_messages
+        )
+
         return "\n---\n".join(formatted)
 
-    def _construct_prompt(self, formatted_blocks: str, formatted_messages: str) -> str:
-        """Construct the prompt for Claude."""
-        return f"""
-        **ROLE AND GOAL:**
-        You are an expert Technical Program Manager analyzing Slack messages and their thread replies to identify potential updates needed in Notion documentation. Your goal is to identify conflicts, new information, or outdated content.
-
-        **PRIMARY CONTEXT: The Source of Truth (Notion Blocks)**
-        {formatted_blocks}
-
-        **INPUT DATA: Recent Slack Messages and Threads**
-        {formatted_messages}
-
-        **YOUR TASK:**
-        Carefully analyze each Slack message and its thread replies, comparing them against the Notion blocks. Pay special attention to threaded conversations as they often contain important clarifications, corrections, or updates. Identify messages that contain:
-        1. New information not present in the documentation
-        2. Updates to existing information
-        3. Direct conflicts with documented information
-        4. Important clarifications or corrections found in thread replies
-        5. Consensus or final decisions reached in thread discussions
-
-        **RULES:**
-        1. Focus on factual conflicts or definitive updates only
-        2. Each suggestion must reference a specific BLOCK_ID
-        3. Consider the full context of threaded conversations
-        4. Pay special attention to thread conclusions and consensus
-        5. Provide high confidence suggestions only
-        6. Consider context and avoid superficial changes
-
-        **REQUIRED OUTPUT FORMAT:**
-        For each suggestion, provide:
-
-        **Suggestion N**
-        * **Source Message Link:** `<Link to the Slack message>`
-        * **Thread Context:** `<Brief summary of relevant thread discussion if applicable>`
-        * **Triggering Text:** "`<Quote the exact phrase from Slack.>`"
-        * **Conflicting Block ID:** "`<The exact BLOCK_ID of the outdated Notion block.>`"
-        * **Conflicting Text in Block:** "`<Quote the specific sentence from the Notion block's content.>`"
-        * **Suggested Edit:** "`<Write the new, updated text for the block.>`"
-        * **Reasoning:** `<Explain why this is a necessary update in one sentence.>`
-        * **Confidence Score:** `<High/Medium/Low>`
-
-        If no valid suggestions are found, respond with "No suggestions found."
+    def _build_message_content(self, formatted_blocks: str, formatted_messages: str) -> List[Dict]:
         """
+        Build the user content blocks for Claude.
+
+        The static instruction scaffold is marked with cache_control so
+        repeated calls within the cache window only pay full price for the
+        dynamic Notion/Slack data.
+        """
+        return [
+            {"type": "text", "text": _PROMPT_PREFIX, "cache_control": {"type": "ephemeral"}},
+            {
+                "type": "text",
+                "text": _PROMPT_DYNAMIC_TEMPLATE.format_map(
+                    {
+                        "formatted_blocks": formatted_blocks,
+                        "formatted_messages": formatted_messages,
+                    }
+                ),
+            },
+        ]
         
     def _parse_suggestions(self, response: str) -> List[Dict]:
         """
         Parse Claude's response into structured suggestions.
-        
-        This is a basic implementation that should be enhanced with more robust parsing.
+
+        Each suggestion block is tokenized with one re.split over the field
+        delimiters, so every field is located in a single pass.
         """
-        suggestions = []
-        
         if "No suggestions found." in response:
-            return suggestions
-            
-        # Split response into individual suggestions
-        parts = response.split("**Suggestion")
-        
-        for part in parts[1:]:  # Skip the first split as it's empty
-            try:
-                # Extract fields using string manipulation
-                # This is a basic implementation - consider using regex for more robust parsing
-                suggestion = {}
-                
-                # Extract link
-                link_start = part.find("**Source Message Link:**") + len("**Source Message Link:**")
-                link_end = part.find("**Thread Context:**")
-                suggestion["source_message_link"] = part[link_start:link_end].strip().strip("`")
-                
-                # Extract thread context
-                context_start = part.find("**Thread Context:**") + len("**Thread Context:**")
-                context_end = part.find("**Triggering Text:**")
-                suggestion["thread_context"] = part[context_start:context_end].strip().strip('"')
-                
-                # Extract triggering text
-                text_start = part.find("**Triggering Text:**") + len("**Triggering Text:**")
-                text_end = part.find("**Conflicting Block ID:**")
-                suggestion["triggering_text"] = part[text_start:text_end].strip().strip('"')
-                
-                # Extract block ID
-                block_start = part.find("**Conflicting Block ID:**") + len("**Conflicting Block ID:**")
-                block_end = part.find("**Conflicting Text in Block:**")
-                suggestion["block_id"] = part[block_start:block_end].strip().strip('"')
-                
-                # Extract conflicting text
-                conflict_start = part.find("**Conflicting Text in Block:**") + len("**Conflicting Text in Block:**")
-                conflict_end = part.find("**Suggested Edit:**")
-                suggestion["conflicting_text"] = part[conflict_start:conflict_end].strip().strip('"')
-                
-                # Extract suggested edit
-                edit_start = part.find("**Suggested Edit:**") + len("**Suggested Edit:**")
-                edit_end = part.find("**Reasoning:**")
-                suggestion["suggested_edit"] = part[edit_start:edit_end].strip().strip('"')
-                
-                # Extract reasoning
-                reason_start = part.find("**Reasoning:**") + len("**Reasoning:**")
-                reason_end = part.find("**Confidence Score:**")
-                suggestion["reasoning"] = part[reason_start:reason_end].strip().strip("`")
-                
-                # Extract confidence
-                conf_start = part.find("**Confidence Score:**") + len("**Confidence Score:**")
-                suggestion["confidence_score"] = part[conf_start:].strip().strip("`")
-                
-                suggestions.append(suggestion)
-                
-            except Exception as e:
-                print(f"Error parsing suggestion: {e}")
+            return []
+
+        suggestions = []
+        for part in response.split("**Suggestion")[1:]:
+            tokens = _FIELD_RE.split(part)
+            fields = {
+                _FIELD_KEYS[name]: value.strip(_STRIP)
+                for name, value in zip(tokens[1::2], tokens[2::2])
+            }
+            if not fields:
+                continue
+            # Delivery needs a block to link to; drop suggestions without
+            # one and default any other absent field to "" so downstream
+            # formatting never hits a KeyError mid-stream
+            if not fields.get("block_id"):
+                print("Skipping suggestion without a Conflicting Block ID")
                 continue
-                
+            for key in _FIELD_KEYS.values():
+                fields.setdefault(key, "")
+            suggestions.append(fields)
         return suggestions 
\ No newline at end of file
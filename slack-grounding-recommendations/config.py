@@ -17,6 +17,7 @@ class MonitoringJob(TypedDict):
     notion_page_id: str
     slack_channel_ids: List[str]
     owner_email: str  # Added to specify document owner
+    model: Optional[str]  # Claude model override; None selects by prompt size
 
 class UserMapping(TypedDict):
     email: str
@@ -42,54 +43,59 @@ USER_MAPPINGS: Dict[str, UserMapping] = {
     # Add more users as needed
 }
 
+# Reverse indexes built once at import so repeated owner lookups in the
+# main loop are O(1) dict hits instead of scans over USER_MAPPINGS
+_BY_SLACK_ID: Dict[str, UserMapping] = {
+    user["slack_id"]: user for user in USER_MAPPINGS.values()
+}
+_BY_NOTION_NAME: Dict[str, UserMapping] = {
+    user["notion_name"]: user for user in USER_MAPPINGS.values()
+}
+
 def get_user_by_email(email: str) -> Optional[UserMapping]:
     """Get user information by email."""
     return USER_MAPPINGS.get(email)
 
 def get_user_by_slack_id(slack_id: str) -> Optional[UserMapping]:
     """Get user information by Slack ID."""
-    return next(
-        (user for user in USER_MAPPINGS.values() if user["slack_id"] == slack_id),
-        None
-    )
+    return _BY_SLACK_ID.get(slack_id)
 
 def get_user_by_notion_name(notion_name: str) -> Optional[UserMapping]:
     """Get user information by Notion display name."""
-    return next(
-        (user for user in USER_MAPPINGS.values() if user["notion_name"] == notion_name),
-        None
-    )
+    return _BY_NOTION_NAME.get(notion_name)
 
 # Helper function to create a monitoring job with extracted page ID
-def create_monitoring_job(name: str, url: str, channel_ids: List[str], owner_email: str) -> MonitoringJob:
+def create_monitoring_job(name: str, url: str, channel_ids: List[str], owner_email: str, model: Optional[str] = None) -> MonitoringJob:
     """
     Create a monitoring job with page ID extraction.
-    
+
     Args:
         name: Job name
         url: Notion page URL
         channel_ids: List of Slack channel IDs to monitor
         owner_email: Email of the document owner
-        
+        model: Claude model to use; None picks a tier by prompt size
+
     Returns:
         MonitoringJob configuration
-        
+
     Raises:
         ValueError: If page ID cannot be extracted or owner email is invalid
     """
     page_id = parse_notion_url(url)
     if not page_id:
         raise ValueError(f"Could not extract page ID from URL: {url}")
-        
+
     if owner_email not in USER_MAPPINGS:
         raise ValueError(f"Owner email {owner_email} not found in USER_MAPPINGS")
-        
+
     return {
         "job_name": name,
         "notion_page_url": url,
         "notion_page_id": page_id,
         "slack_channel_ids": channel_ids,
-        "owner_email": owner_email
+        "owner_email": owner_email,
+        "model": model
     }
 
 # Central configuration for monitoring jobs
@@ -1,7 +1,16 @@
+import asyncio
 import functions_framework
-from typing import Dict, Any
+import json
+from typing import Any, Dict, Optional
 import os
 
+from google.api_core.exceptions import NotFound
+from google.cloud import storage
+
+# Cap concurrent jobs so a long MONITORING_JOBS list cannot stampede the
+# Claude API; jobs beyond the cap queue behind the semaphore.
+MAX_CONCURRENT_JOBS = 8
+
 from config import MONITORING_JOBS
 from utils import get_secret, parse_notion_url, construct_notion_block_url
 from slack_client import SlackClient
@@ -20,67 +29,252 @@ def initialize_clients(project_id: str) -> tuple:
         AIAnalyzer(anthropic_key)
     )
 
-def process_monitoring_job(
+async def _prepare_job(
+    job: Dict[str, Any],
+    notion_client: NotionClient,
+    slack_client: SlackClient
+) -> Dict[str, Any]:
+    """Fetch everything a job needs before the Claude call.
+
+    Returns an empty dict when any prerequisite (owner, blocks, messages)
+    is missing, so callers can skip the job cheaply.
+    """
+    # Use the page ID resolved at config time; fall back to parsing the URL
+    # for ad-hoc job dicts that skipped create_monitoring_job
+    page_id = job.get("notion_page_id") or parse_notion_url(job["notion_page_url"])
+    if not page_id:
+        print(f"Invalid Notion URL in job {job['job_name']}")
+        return {}
+
+    # 1. Fetch the owner email, Notion blocks and Slack messages
+    # concurrently - the three calls are independent network I/O
+    owner_email, notion_blocks, slack_messages = await asyncio.gather(
+        asyncio.to_thread(notion_client.get_page_owner_email, page_id),
+        asyncio.to_thread(notion_client.get_page_blocks, page_id),
+        asyncio.to_thread(slack_client.get_messages_from_channels, job["slack_channel_ids"]),
+    )
+    if not owner_email:
+        print(f"Could not find owner email for page {page_id}")
+        return {}
+    if not notion_blocks:
+        print(f"No blocks found in page {page_id}")
+        return {}
+    if not slack_messages:
+        print(f"No messages found in channels {job['slack_channel_ids']}")
+        return {}
+
+    # 2. Get owner's Slack ID (needs the owner email from above)
+    slack_user_id = await asyncio.to_thread(slack_client.get_user_id_by_email, owner_email)
+    if not slack_user_id:
+        print(f"Could not find Slack user for email {owner_email}")
+        return {}
+
+    return {
+        "page_id": page_id,
+        "slack_user_id": slack_user_id,
+        "notion_blocks": notion_blocks,
+        "slack_messages": slack_messages,
+    }
+
+def _deliver_suggestions(
+    context: Dict[str, Any],
+    suggestions: list,
+    slack_client: SlackClient
+) -> None:
+    """Attach deep links and send each suggestion to the page owner."""
+    for suggestion in suggestions:
+        # Add the Notion deep link
+        suggestion["notion_url"] = construct_notion_block_url(context["page_id"], suggestion["block_id"])
+
+        # Send suggestion to user
+        success = slack_client.post_suggestion_to_user(context["slack_user_id"], suggestion)
+        if success:
+            print(f"Successfully sent suggestion for block {suggestion['block_id']} to user {context['slack_user_id']}")
+        else:
+            print(f"Failed to send suggestion for block {suggestion['block_id']} to user {context['slack_user_id']}")
+
+async def process_monitoring_job(
     job: Dict[str, Any],
     notion_client: NotionClient,
     slack_client: SlackClient,
     ai_analyzer: AIAnalyzer
 ) -> None:
     """Process a single monitoring job."""
-    # Extract page ID from Notion URL
-    page_id = parse_notion_url(job["notion_page_url"])
-    if not page_id:
-        print(f"Invalid Notion URL in job {job['job_name']}")
-        return
-        
     try:
-        # 1. Get page owner's email
-        owner_email = notion_client.get_page_owner_email(page_id)
-        if not owner_email:
-            print(f"Could not find owner email for page {page_id}")
-            return
-            
-        # 2. Get owner's Slack ID
-        slack_user_id = slack_client.get_user_id_by_email(owner_email)
-        if not slack_user_id:
-            print(f"Could not find Slack user for email {owner_email}")
-            return
-            
-        # 3. Get Notion blocks
-        notion_blocks = notion_client.get_page_blocks(page_id)
-        if not notion_blocks:
-            print(f"No blocks found in page {page_id}")
-            return
-            
-        # 4. Get Slack messages
-        slack_messages = slack_client.get_messages_from_channels(job["slack_channel_ids"])
-        if not slack_messages:
-            print(f"No messages found in channels {job['slack_channel_ids']}")
+        context = await _prepare_job(job, notion_client, slack_client)
+        if not context:
             return
-            
-        # 5. Generate suggestions using AI
-        suggestions = ai_analyzer.generate_suggestions(notion_blocks, slack_messages)
-        
-        # 6. Process each suggestion
-        for suggestion in suggestions:
-            # Add the Notion deep link
-            suggestion["notion_url"] = construct_notion_block_url(page_id, suggestion["block_id"])
-            
-            # Send suggestion to user
-            success = slack_client.post_suggestion_to_user(slack_user_id, suggestion)
-            if success:
-                print(f"Successfully sent suggestion for block {suggestion['block_id']} to user {slack_user_id}")
-            else:
-                print(f"Failed to send suggestion for block {suggestion['block_id']} to user {slack_user_id}")
-                
+
+        # Stream suggestions from the AI and send each one as soon as it
+        # is complete, overlapping Slack posting with model generation;
+        # the sync Slack post runs in a thread so it never blocks the
+        # other jobs sharing this event loop
+        async for suggestion in ai_analyzer.astream_suggestions(
+            context["notion_blocks"], context["slack_messages"], job.get("model")
+        ):
+            await asyncio.to_thread(_deliver_suggestions, context, [suggestion], slack_client)
+
     except Exception as e:
         print(f"Error processing job {job['job_name']}: {e}")
 
+async def _run_all_jobs(
+    notion_client: NotionClient,
+    slack_client: SlackClient,
+    ai_analyzer: AIAnalyzer
+) -> None:
+    """Fan out all monitoring jobs concurrently, bounded by a semaphore."""
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_JOBS)
+
+    async def _bounded(job: Dict[str, Any]) -> None:
+        async with semaphore:
+            await process_monitoring_job(job, notion_client, slack_client, ai_analyzer)
+
+    await asyncio.gather(*[_bounded(job) for job in MONITORING_JOBS])
+
+# Pending-batch state persisted between scheduler ticks. A message batch
+# can take minutes up to an hour while the function is killed after two
+# minutes, so one tick submits the batch and a later tick collects it.
+_BATCH_STATE_BUCKET_ENV = "SUGGESTION_CACHE_BUCKET"
+_BATCH_STATE_BLOB = "message-batches/pending.json"
+
+def _batch_state_blob() -> Optional[storage.Blob]:
+    """Return the GCS blob holding pending-batch state, if configured."""
+    bucket_name = os.environ.get(_BATCH_STATE_BUCKET_ENV)
+    if not bucket_name:
+        return None
+    return storage.Client().bucket(bucket_name).blob(_BATCH_STATE_BLOB)
+
+def _load_batch_state() -> Optional[Dict[str, Any]]:
+    """Load the pending-batch state, or None when nothing is in flight."""
+    blob = _batch_state_blob()
+    if blob is None:
+        return None
+    try:
+        return json.loads(blob.download_as_text())
+    except NotFound:
+        return None
+    except Exception as e:
+        print(f"Error loading batch state: {e}")
+        return None
+
+def _save_batch_state(state: Dict[str, Any]) -> None:
+    """Persist the pending-batch state for the next invocation."""
+    blob = _batch_state_blob()
+    if blob is not None:
+        blob.upload_from_string(json.dumps(state))
+
+def _clear_batch_state() -> None:
+    """Remove the pending-batch state once its results are delivered."""
+    blob = _batch_state_blob()
+    if blob is not None:
+        try:
+            blob.delete()
+        except NotFound:
+            pass
+
+async def _collect_pending_batch(
+    state: Dict[str, Any],
+    slack_client: SlackClient,
+    ai_analyzer: AIAnalyzer
+) -> None:
+    """Deliver the results of a batch submitted by an earlier invocation."""
+    batch_id = state["batch_id"]
+    results = await ai_analyzer.aretrieve_batch_results(batch_id)
+    if results is None:
+        print(f"Message batch {batch_id} still processing")
+        return
+
+    for custom_id, suggestions in results.items():
+        context = state["jobs"].get(custom_id)
+        if not context:
+            continue
+        try:
+            _deliver_suggestions(context, suggestions, slack_client)
+        except Exception as e:
+            print(f"Error delivering suggestions for {custom_id}: {e}")
+    _clear_batch_state()
+
+async def _run_all_jobs_batched(
+    notion_client: NotionClient,
+    slack_client: SlackClient,
+    ai_analyzer: AIAnalyzer
+) -> None:
+    """
+    Process every monitoring job through the Message Batches API.
+
+    Batched requests are billed at half the standard token rate. Each
+    invocation either collects a previously submitted batch or submits a
+    new one; results are picked up by a later scheduler tick rather than
+    polled in-process, which would outlive the function timeout.
+    """
+    # Without somewhere to persist the batch ID the results could never
+    # be collected, so fall back to the concurrent path instead of
+    # paying for a batch that would be abandoned.
+    if _batch_state_blob() is None:
+        print(f"{_BATCH_STATE_BUCKET_ENV} not set; processing jobs concurrently instead of batched")
+        await _run_all_jobs(notion_client, slack_client, ai_analyzer)
+        return
+
+    state = _load_batch_state()
+    if state:
+        await _collect_pending_batch(state, slack_client, ai_analyzer)
+        return
+
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_JOBS)
+
+    async def _bounded_prepare(job: Dict[str, Any]) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                return await _prepare_job(job, notion_client, slack_client)
+            except Exception as e:
+                print(f"Error preparing job {job['job_name']}: {e}")
+                return {}
+
+    contexts = await asyncio.gather(*[_bounded_prepare(job) for job in MONITORING_JOBS])
+
+    # custom_id must be a short identifier, so key batch entries by job index.
+    requests = []
+    ready = {}
+    for index, context in enumerate(contexts):
+        if not context:
+            continue
+        custom_id = f"job-{index}"
+        ready[custom_id] = context
+        requests.append(
+            ai_analyzer.build_request(
+                context["notion_blocks"],
+                context["slack_messages"],
+                custom_id,
+                MONITORING_JOBS[index].get("model"),
+            )
+        )
+    if not requests:
+        print("No monitoring jobs ready for analysis")
+        return
+
+    batch_id = await ai_analyzer.asubmit_batch(requests)
+    # Persist only what delivery needs; blocks and messages stay behind.
+    _save_batch_state({
+        "batch_id": batch_id,
+        "jobs": {
+            custom_id: {
+                "page_id": context["page_id"],
+                "slack_user_id": context["slack_user_id"],
+            }
+            for custom_id, context in ready.items()
+        },
+    })
+    print(f"Submitted message batch {batch_id} with {len(requests)} jobs")
+
+def _use_message_batches() -> bool:
+    """Whether to route Claude calls through the Message Batches API."""
+    return os.environ.get("USE_MESSAGE_BATCHES", "").lower() in ("1", "true", "yes")
+
 @functions_framework.http
 def monitor_notion_slack(request) -> tuple:
     """
     Cloud Function entry point.
-    
+
     This function is triggered by Cloud Scheduler and processes all monitoring jobs.
     """
     try:
@@ -88,16 +282,19 @@ def monitor_notion_slack(request) -> tuple:
         project_id = os.environ.get("GOOGLE_CLOUD_PROJECT")
         if not project_id:
             return "Missing GOOGLE_CLOUD_PROJECT environment variable", 500
-            
+
         # Initialize clients
         notion_client, slack_client, ai_analyzer = initialize_clients(project_id)
-        
-        # Process each monitoring job
-        for job in MONITORING_JOBS:
-            process_monitoring_job(job, notion_client, slack_client, ai_analyzer)
-            
+
+        # Process all monitoring jobs, either batched for cost or
+        # concurrently for latency
+        if _use_message_batches():
+            asyncio.run(_run_all_jobs_batched(notion_client, slack_client, ai_analyzer))
+        else:
+            asyncio.run(_run_all_jobs(notion_client, slack_client, ai_analyzer))
+
         return "Successfully processed all monitoring jobs", 200
-        
+
     except Exception as e:
         print(f"Error in monitor_notion_slack: {e}")
         return f"Error: {str(e)}", 500
@@ -107,5 +304,4 @@ if __name__ == "__main__":
     project_id = os.getenv("GOOGLE_CLOUD_PROJECT")
     if project_id:
         notion_client, slack_client, ai_analyzer = initialize_clients(project_id)
-        for job in MONITORING_JOBS:
-            process_monitoring_job(job, notion_client, slack_client, ai_analyzer) 
\ No newline at end of file
+        asyncio.run(_run_all_jobs(notion_client, slack_client, ai_analyzer)) 
\ No newline at end of file
@@ -1,17 +1,22 @@
+import asyncio
 from typing import List, Dict, Optional
-from notion_client import Client
+from notion_client import AsyncClient, Client
 from notion_client.errors import APIResponseError
 
+# Notion allows roughly 3 requests/second per integration
+MAX_CONCURRENT_REQUESTS = 3
+
 class NotionClient:
     def __init__(self, token: str):
         """
         Initialize the Notion client.
-        
+
         Args:
             token: Notion API token
         """
         self.client = Client(auth=token)
-        
+        self._token = token
+
     def get_page_owner_email(self, page_id: str) -> Optional[str]:
         """
         Fetch the email address of the page owner from the "Owner" property.
@@ -39,80 +44,152 @@ class NotionClient:
             
         return None
         
-    def get_page_blocks(self, page_id: str) -> List[Dict]:
+    async def _alist_children(self, client: AsyncClient, block_id: str, semaphore: asyncio.Semaphore) -> List[Dict]:
+        """Fetch all child blocks of one block, following pagination."""
+        results = []
+        start_cursor = None
+        while True:
+            async with semaphore:
+                response = await client.blocks.children.list(
+                    block_id=block_id,
+                    start_cursor=start_cursor
+                )
+            results.extend(response["results"])
+            if not response["has_more"]:
+                return results
+            start_cursor = response.get("next_cursor")
+
+    async def _acollect_blocks(self, client: AsyncClient, block_id: str, semaphore: asyncio.Semaphore) -> List[Dict]:
         """
-        Retrieve all blocks from a Notion page and return them in a simplified format.
-        
+        Collect text blocks under one block, recursing into children.
+
+        Child-block fetches at the same depth run concurrently under the
+        shared semaphore; each subtree returns its own list so the final
+        order always follows the document.
+        """
+        children = await self._alist_children(client, block_id, semaphore)
+        nested_ids = [block["id"] for block in children if block.get("has_children")]
+        nested_lists = await asyncio.gather(
+            *[self._acollect_blocks(client, child_id, semaphore) for child_id in nested_ids]
+        )
+        nested_by_id = dict(zip(nested_ids, nested_lists))
+
+        blocks: List[Dict] = []
+        for block in children:
+            # Extract text content based on block type
+            content = self._extract_block_text(block)
+            if content:
+                blocks.append({
+                    "id": block["id"],
+                    "content": content,
+                    "type": block["type"]
+                })
+            if block.get("has_children"):
+                blocks.extend(nested_by_id[block["id"]])
+        return blocks
+
+    async def aget_page_blocks(self, page_id: str) -> List[Dict]:
+        """
+        Retrieve all blocks from a Notion page concurrently.
+
+        A fresh AsyncClient is created per call because each call may run
+        under its own event loop (callers wrap this in asyncio.run from
+        worker threads), and httpx pools must not be shared across loops.
+
         Args:
             page_id: Notion page ID
-            
+
         Returns:
             List of dictionaries containing block IDs and their text content
         """
-        blocks = []
-        
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        client = AsyncClient(auth=self._token)
         try:
-            # Fetch all blocks using pagination
-            has_more = True
-            start_cursor = None
-            
-            while has_more:
-                response = self.client.blocks.children.list(
-                    block_id=page_id,
-                    start_cursor=start_cursor
-                )
-                
-                for block in response["results"]:
-                    # Extract text content based on block type
-                    content = self._extract_block_text(block)
-                    if content:
-                        blocks.append({
-                            "id": block["id"],
-                            "content": content,
-                            "type": block["type"]
-                        })
-                        
-                has_more = response["has_more"]
-                start_cursor = response.get("next_cursor")
-                
+            return await self._acollect_blocks(client, page_id, semaphore)
         except APIResponseError as e:
             print(f"Error fetching blocks for page {page_id}: {e}")
-            
-        return blocks
+            return []
+        finally:
+            await client.aclose()
+
+    def get_page_blocks(self, page_id: str) -> List[Dict]:
+        """
+        Synchronous wrapper around aget_page_blocks.
+
+        Args:
+            page_id: Notion page ID
+
+        Returns:
+            List of dictionaries containing block IDs and their text content
+        """
+        return asyncio.run(self.aget_page_blocks(page_id))
         
+    # Block types whose text lives directly in a rich_text array;
+    # frozenset membership beats the old list scan per block
+    _RICH_TEXT_TYPES = frozenset({
+        "paragraph",
+        "heading_1",
+        "heading_2",
+        "heading_3",
+        "bulleted_list_item",
+        "numbered_list_item",
+    })
+
     def _extract_block_text(self, block: Dict) -> Optional[str]:
         """
         Extract plain text content from a Notion block.
-        
+
         Args:
             block: Notion block object
-            
+
         Returns:
             Plain text content if available, None otherwise
         """
         block_type = block["type"]
-        
-        # Handle different block types
-        if block_type in ["paragraph", "heading_1", "heading_2", "heading_3", "bulleted_list_item", "numbered_list_item"]:
+
+        if block_type in self._RICH_TEXT_TYPES:
             rich_text = block[block_type].get("rich_text", [])
-            return "".join(text.get("plain_text", "") for text in rich_text)
-            
-        elif block_type == "table":
-            # For tables, include a structured representation
-            rows = []
-            for row in block.get("table", {}).get("rows", []):
-                cells = []
-                for cell in row.get("cells", []):
-                    cell_text = "".join(text.get("plain_text", "") for text in cell)
-                    cells.append(cell_text)
-                rows.append(" | ".join(cells))
-            return "\n".join(rows)
-            
-        elif block_type == "code":
-            # For code blocks, include the language
-            code = block["code"]
-            language = code.get("language", "")
-            text = "".join(text.get("plain_text", "") for text in code.get("rich_text", []))
-            return f"```{language}\n{text}\n```"
-            
-        return None 
\ No newline at end of file
+            # Most paragraphs carry a single rich-text run; skip the join
+            if not rich_text:
+                return ""
+            if len(rich_text) == 1:
+                return rich_text[0].get("plain_text", "")
+            # str.join runs faster over a list than a generator
+            return "".join([text.get("plain_text", "") for text in rich_text])
+
+        extractor = self._EXTRACTORS.get(block_type)
+        if extractor:
+            return extractor(self, block)
+
+        return None
+
+    def _extract_table_text(self, block: Dict) -> str:
+        """Render a table block as pipe-separated rows."""
+        # Emit cells and separators into one flat list so a single join
+        # builds the result, with no intermediate per-row strings
+        parts = []
+        for row in block.get("table", {}).get("rows", []):
+            if parts:
+                parts.append("\n")
+            for i, cell in enumerate(row.get("cells", [])):
+                if i:
+                    parts.append(" | ")
+                parts.append("".join([text.get("plain_text", "") for text in cell]))
+        return "".join(parts)
+
+    def _extract_code_text(self, block: Dict) -> str:
+        """Render a code block as a fenced snippet with its language."""
+        code = block["code"]
+        language = code.get("language", "")
+        rich_text = code.get("rich_text", [])
+        if len(rich_text) == 1:
+            text = rich_text[0].get("plain_text", "")
+        else:
+            text = "".join([text.get("plain_text", "") for text in rich_text])
+        return f"```{language}\n{text}\n```"
+
+    # Dispatch table for block types needing structured rendering
+    _EXTRACTORS = {
+        "table": _extract_table_text,
+        "code": _extract_code_text,
+    } 
\ No newline at end of file
@@ -5,6 +5,9 @@ Creates a unified user dictionary with information from both platforms.
 """
 import os
 import json
+import logging
+import logging.handlers
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Optional
 from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
@@ -17,6 +20,19 @@ from dotenv import load_dotenv
 env_path = Path(__file__).parent / '.env'
 load_dotenv(env_path)
 
+# Per-user progress goes through a buffered logger instead of print so the
+# fetch loops are not serialized on stdout flushes; records accumulate in
+# memory and only flush in bulk (immediately on WARNING or above).
+logger = logging.getLogger(__name__)
+logger.addHandler(
+    logging.handlers.MemoryHandler(
+        capacity=1000,
+        flushLevel=logging.WARNING,
+        target=logging.StreamHandler(),
+    )
+)
+logger.setLevel(logging.INFO)
+
 def get_slack_users(slack_client: WebClient) -> Dict[str, Dict]:
     """
     Fetch all users from Slack, organized by display name for matching.
@@ -36,13 +52,12 @@ def get_slack_users(slack_client: WebClient) -> Dict[str, Dict]:
                     break
                 
                 members = result.get("members", [])
-                print(f"Processing {len(members)} Slack users...")
-                
+
                 for member in members:
                     # Skip bots and deleted users
                     if member.get("is_bot") or member.get("deleted"):
                         continue
-                    
+
                     real_name = member.get("real_name", "").strip()
                     if real_name:
                         users_by_name[real_name.lower()] = {
@@ -50,8 +65,10 @@ def get_slack_users(slack_client: WebClient) -> Dict[str, Dict]:
                             "slack_name": f"@{member.get('name', '')}",
                             "real_name": real_name
                         }
-                        print(f"Added Slack user: {real_name}")
-                
+
+                # One summary line per page; filtered out at INFO level
+                logger.debug("Processed %d Slack users in page", len(members))
+
                 cursor = result.get("response_metadata", {}).get("next_cursor")
                 if not cursor:
                     break
@@ -90,10 +107,10 @@ def get_notion_users(notion_client: NotionClient) -> Dict[str, Dict]:
                     "email": email,
                     "notion_id": user["id"],
                     "notion_name": name,
+                    "notion_name_lc": name.lower(),  # Precomputed match key
                     "slack_id": None,  # Will be filled in later
                     "slack_name": None  # Will be filled in later
                 }
-                print(f"Added Notion user: {name} ({email})")
     
     except APIResponseError as e:
         print(f"Error fetching Notion users: {e}")
@@ -116,10 +133,8 @@ def merge_user_info(notion_users: Dict[str, Dict], slack_users: Dict[str, Dict])
     unified_users = {}
     
     for email, notion_info in notion_users.items():
-        notion_name = notion_info["notion_name"].lower()
-        
-        # Try to find matching Slack user by name
-        slack_info = slack_users.get(notion_name)
+        # Match on the lowercase key precomputed during the Notion fetch
+        slack_info = slack_users.get(notion_info["notion_name_lc"])
         if slack_info:
             unified_users[email] = {
                 "email": email,
@@ -128,34 +143,51 @@ def merge_user_info(notion_users: Dict[str, Dict], slack_users: Dict[str, Dict])
                 "slack_id": slack_info["slack_id"],
                 "slack_name": slack_info["slack_name"]
             }
-            print(f"Matched user: {notion_info['notion_name']} ({email}) - {slack_info['slack_name']}")
+            logger.debug(
+                "Matched user: %s (%s) - %s",
+                notion_info["notion_name"], email, slack_info["slack_name"],
+            )
         else:
-            print(f"No Slack match found for Notion user: {notion_info['notion_name']} ({email})")
+            logger.debug(
+                "No Slack match found for Notion user: %s (%s)",
+                notion_info["notion_name"], email,
+            )
             unified_users[email] = notion_info  # Keep Notion info even without Slack match
     
     return unified_users
 
-def generate_config_code(user_mappings: Dict[str, Dict]) -> str:
-    """Generate Python code for the USER_MAPPINGS configuration."""
-    lines = ["# User mappings with Notion and Slack information"]
-    lines.append("USER_MAPPINGS: Dict[str, UserMapping] = {")
-    
+def generate_config_code(user_mappings: Dict[str, Dict], fp) -> None:
+    """
+    Write Python code for the USER_MAPPINGS configuration to a file.
+
+    Streams each line straight to the file handle instead of accumulating
+    the whole output in memory first.
+
+    Args:
+        user_mappings: Unified user profiles keyed by email
+        fp: Writable text file handle
+    """
+    fp.write("# User mappings with Notion and Slack information\n")
+    fp.write("USER_MAPPINGS: Dict[str, UserMapping] = {\n")
+
     for email, info in user_mappings.items():
-        lines.append(f"    # {info['notion_name']}")
-        lines.append(f"    \"{email}\": {{")
-        lines.append(f"        \"email\": \"{info['email']}\",")
-        lines.append(f"        \"notion_id\": \"{info['notion_id']}\",")
-        lines.append(f"        \"notion_name\": \"{info['notion_name']}\",")
+        fp.write(f"    # {info['notion_name']}\n")
+        fp.write(f"    \"{email}\": {{\n")
+        fp.write(f"        \"email\": \"{info['email']}\",\n")
+        fp.write(f"        \"notion_id\": \"{info['notion_id']}\",\n")
+        fp.write(f"        \"notion_name\": \"{info['notion_name']}\",\n")
         if info.get("slack_id"):
-            lines.append(f"        \"slack_id\": \"{info['slack_id']}\",")
-            lines.append(f"        \"slack_name\": \"{info['slack_name']}\",")
+            fp.write(f"        \"slack_id\": \"{info['slack_id']}\",\n")
+            fp.write(f"        \"slack_name\": \"{info['slack_name']}\",\n")
         else:
-            lines.append("        \"slack_id\": None,")
-            lines.append("        \"slack_name\": None,")
-        lines.append("    },")
-    
-    lines.append("}")
-    return "\n".join(lines)
+            fp.write("        \"slack_id\": None,\n")
+            fp.write("        \"slack_name\": None,\n")
+        fp.write("    },\n")
+
+    fp.write("}\n")
+    fp.write("\n# Reverse indexes built once at import for O(1) lookups\n")
+    fp.write('USER_BY_SLACK_ID = {v["slack_id"]: v for v in USER_MAPPINGS.values() if v.get("slack_id")}\n')
+    fp.write('USER_BY_NOTION_ID = {v["notion_id"]: v for v in USER_MAPPINGS.values() if v.get("notion_id")}\n')
 
 def main():
     # Get API tokens from environment
@@ -171,25 +203,31 @@ def main():
     slack_client = WebClient(token=slack_token)
     notion_client = NotionClient(auth=notion_token)
     
-    # Get users from both platforms
-    slack_users = get_slack_users(slack_client)
-    notion_users = get_notion_users(notion_client)
+    # Get users from both platforms; the fetches are independent and
+    # I/O-bound, so run them concurrently
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        slack_future = pool.submit(get_slack_users, slack_client)
+        notion_future = pool.submit(get_notion_users, notion_client)
+        slack_users = slack_future.result()
+        notion_users = notion_future.result()
     
     # Create unified user mappings
     unified_users = merge_user_info(notion_users, slack_users)
     print(f"\nCreated {len(unified_users)} unified user profiles")
     
     # Save raw data for reference
-    with open("user_mappings_raw.json", "w") as f:
+    # ensure_ascii=False writes names as UTF-8 instead of \uXXXX escapes -
+    # cheaper to encode and smaller on disk; indent stays because this file
+    # is reviewed by hand before updating config.py
+    with open("user_mappings_raw.json", "w", encoding="utf-8") as f:
         json.dump({
             "unified_users": unified_users
-        }, f, indent=2)
+        }, f, indent=2, ensure_ascii=False)
     print("\nSaved raw data to user_mappings_raw.json")
     
     # Generate and save configuration code
-    config_code = generate_config_code(unified_users)
-    with open("user_mappings_config.py", "w") as f:
-        f.write(config_code)
+    with open("user_mappings_config.py", "w", buffering=1 << 20) as f:
+        generate_config_code(unified_users, f)
     print("\nSaved configuration code to user_mappings_config.py")
     
     # Print summary
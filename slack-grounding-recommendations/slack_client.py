@@ -1,114 +1,359 @@
+import asyncio
+import copy
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import AsyncIterator, List, Dict, Optional
+from cachetools import TTLCache
 from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
+from slack_sdk.web.async_client import AsyncWebClient
 from config import get_user_by_email, get_user_by_slack_id, UserMapping
 
+# Concurrent channel fetches allowed before queuing behind the semaphore;
+# conversations.history is a Tier 3 method, so keep this modest.
+MAX_CONCURRENT_FETCHES = 5
+
+def _make_suggestion_template(with_thread_context: bool) -> List[Dict]:
+    """Build the Block Kit skeleton for a suggestion message."""
+    blocks = [
+        {
+            "type": "header",
+            "text": {
+                "type": "plain_text",
+                "text": "🔄 Potential Document Update Needed"
+            }
+        },
+        {
+            "type": "section",
+            "text": {
+                "type": "mrkdwn",
+                "text": ""
+            }
+        },
+        {
+            "type": "section",
+            "text": {
+                "type": "mrkdwn",
+                "text": ""
+            }
+        },
+        {
+            "type": "section",
+            "text": {
+                "type": "mrkdwn",
+                "text": ""
+            }
+        }
+    ]
+    if with_thread_context:
+        blocks.append({
+            "type": "section",
+            "text": {
+                "type": "mrkdwn",
+                "text": ""
+            }
+        })
+    blocks.extend([
+        {
+            "type": "section",
+            "text": {
+                "type": "mrkdwn",
+                "text": ""
+            }
+        },
+        {
+            "type": "actions",
+            "elements": [
+                {
+                    "type": "button",
+                    "text": {
+                        "type": "plain_text",
+                        "text": "View in Notion"
+                    },
+                    "url": "",
+                    "style": "primary"
+                }
+            ]
+        }
+    ])
+    return blocks
+
+# Precomputed message skeletons, deep-copied per send; a str.format pass
+# over serialized JSON would trip on braces in user-supplied text
+_SUGGESTION_TEMPLATES = {
+    False: _make_suggestion_template(False),
+    True: _make_suggestion_template(True),
+}
+
 class SlackClient:
     def __init__(self, token: str):
         """
         Initialize the Slack client.
-        
+
         Args:
             token: Slack bot token
         """
         self.client = WebClient(token=token)
-        
-    def get_messages_from_channels(self, channel_ids: List[str], days: int = 7) -> List[Dict]:
+        self.async_client = AsyncWebClient(token=token)
+        self._workspace_url: Optional[str] = None
+        # Memoized users.lookupByEmail results; misses cached briefly so
+        # unknown emails are not re-queried on every message
+        self._email_id_cache: TTLCache = TTLCache(maxsize=4096, ttl=3600)
+        self._email_miss_cache: TTLCache = TTLCache(maxsize=4096, ttl=300)
+        self._cache_lock = threading.Lock()
+        # Full email -> ID index built from users.list, refreshed hourly
+        self._email_index: Optional[Dict[str, str]] = None
+        self._email_index_expiry: float = 0.0
+
+    async def _get_workspace_url(self) -> str:
         """
-        Fetch messages and their thread replies from specified channels within the last N days.
-        
+        Resolve the workspace base URL once per client via auth.test.
+
+        Permalinks are then constructed locally against it, so no
+        chat.getPermalink round-trip is needed per message.
+        """
+        if self._workspace_url is None:
+            try:
+                result = await self.async_client.auth_test()
+                self._workspace_url = result.get("url", "https://slack.com/").rstrip("/")
+            except SlackApiError as e:
+                print(f"Error resolving workspace URL: {e}")
+                self._workspace_url = "https://slack.com"
+        return self._workspace_url
+
+    def _build_permalink(self, channel_id: str, ts: str, thread_ts: Optional[str] = None) -> str:
+        """
+        Construct the canonical Slack archive permalink locally.
+
         Args:
-            channel_ids: List of Slack channel IDs
-            days: Number of days to look back (default: 7)
-            
+            channel_id: Slack channel ID
+            ts: Message timestamp
+            thread_ts: Parent timestamp for thread replies
+
+        Returns:
+            Permalink URL for the message
+        """
+        base = self._workspace_url or "https://slack.com"
+        url = f"{base}/archives/{channel_id}/p{ts.replace('.', '')}"
+        if thread_ts:
+            url += f"?thread_ts={thread_ts}&cid={channel_id}"
+        return url
+
+    async def _fetch_replies(self, channel_id: str, ts: str, semaphore: asyncio.Semaphore) -> List[Dict]:
+        """Fetch the replies of one thread; errors log and return an empty list."""
+        try:
+            async with semaphore:
+                result = await self.async_client.conversations_replies(
+                    channel=channel_id,
+                    ts=ts,
+                    limit=1000  # Adjust as needed
+                )
+            if result["ok"]:
+                return result["messages"]
+        except SlackApiError as e:
+            print(f"Error fetching thread replies for message {ts}: {e}")
+        return []
+
+    async def _fetch_channel(self, channel_id: str, oldest: float, semaphore: asyncio.Semaphore) -> List[Dict]:
+        """
+        Fetch messages and thread replies from one channel.
+
+        Fetches the history, then all thread-reply lists in one concurrent
+        burst; permalinks are computed locally and cost no round-trips.
+
+        Args:
+            channel_id: Slack channel ID
+            oldest: Oldest message timestamp to include
+            semaphore: Shared concurrency bound across channel fetches
+
         Returns:
             List of messages with their metadata and thread replies
         """
-        messages = []
-        oldest = (datetime.now() - timedelta(days=days)).timestamp()
-        
-        for channel_id in channel_ids:
-            try:
-                # Fetch messages using conversations.history
-                result = self.client.conversations_history(
+        try:
+            async with semaphore:
+                # Phase 1: fetch messages using conversations.history
+                result = await self.async_client.conversations_history(
                     channel=channel_id,
                     oldest=oldest,
                     limit=1000,  # Adjust as needed
                     include_all_metadata=True  # Get additional message metadata
                 )
-                
-                if result["ok"]:
-                    # Process each message
-                    for msg in result["messages"]:
-                        # Add channel context
-                        msg["channel_id"] = channel_id
-                        
-                        # Get message permalink
-                        try:
-                            permalink_result = self.client.chat_getPermalink(
-                                channel=channel_id,
-                                message_ts=msg["ts"]
-                            )
-                            if permalink_result["ok"]:
-                                msg["permalink"] = permalink_result["permalink"]
-                        except SlackApiError as e:
-                            print(f"Error getting permalink for message {msg['ts']}: {e}")
-                            msg["permalink"] = f"https://slack.com/archives/{channel_id}/p{msg['ts'].replace('.', '')}"
-                        
-                        # Add the main message
-                        messages.append(msg)
-                        
-                        # If message has thread replies, fetch them
-                        if msg.get("thread_ts") or msg.get("reply_count", 0) > 0:
-                            try:
-                                thread_result = self.client.conversations_replies(
-                                    channel=channel_id,
-                                    ts=msg["ts" if not msg.get("thread_ts") else "thread_ts"],
-                                    limit=1000  # Adjust as needed
-                                )
-                                
-                                if thread_result["ok"]:
-                                    for reply in thread_result["messages"]:
-                                        # Skip the parent message as we already have it
-                                        if reply["ts"] == msg["ts"]:
-                                            continue
-                                            
-                                        # Add thread context
-                                        reply["channel_id"] = channel_id
-                                        reply["is_thread_reply"] = True
-                                        reply["parent_ts"] = msg["ts"]
-                                        
-                                        # Get reply permalink
-                                        try:
-                                            reply_permalink = self.client.chat_getPermalink(
-                                                channel=channel_id,
-                                                message_ts=reply["ts"]
-                                            )
-                                            if reply_permalink["ok"]:
-                                                reply["permalink"] = reply_permalink["permalink"]
-                                        except SlackApiError as e:
-                                            print(f"Error getting permalink for reply {reply['ts']}: {e}")
-                                            reply["permalink"] = f"https://slack.com/archives/{channel_id}/p{reply['ts'].replace('.', '')}"
-                                        
-                                        messages.append(reply)
-                                        
-                            except SlackApiError as e:
-                                print(f"Error fetching thread replies for message {msg['ts']}: {e}")
-                        
-            except SlackApiError as e:
-                print(f"Error fetching messages from channel {channel_id}: {e}")
-                
+        except SlackApiError as e:
+            print(f"Error fetching messages from channel {channel_id}: {e}")
+            return []
+        if not result["ok"]:
+            return []
+
+        history = result["messages"]
+        threaded = [
+            msg for msg in history
+            if msg.get("thread_ts") or msg.get("reply_count", 0) > 0
+        ]
+
+        # All thread-reply lists in one concurrent burst
+        reply_lists = await asyncio.gather(
+            *[
+                self._fetch_replies(
+                    channel_id,
+                    msg["ts" if not msg.get("thread_ts") else "thread_ts"],
+                    semaphore,
+                )
+                for msg in threaded
+            ]
+        )
+
+        messages = []
+        for msg in history:
+            msg["channel_id"] = channel_id
+            msg["permalink"] = self._build_permalink(channel_id, msg["ts"])
+            messages.append(msg)
+
+        for parent, replies in zip(threaded, reply_lists):
+            for reply in replies:
+                # Skip the parent message as we already have it
+                if reply["ts"] == parent["ts"]:
+                    continue
+                reply["channel_id"] = channel_id
+                reply["is_thread_reply"] = True
+                reply["parent_ts"] = parent["ts"]
+                reply["permalink"] = self._build_permalink(channel_id, reply["ts"], parent["ts"])
+                messages.append(reply)
+
         return messages
+
+    async def aiter_messages_from_channels(self, channel_ids: List[str], days: int = 7) -> AsyncIterator[Dict]:
+        """
+        Yield messages and thread replies channel by channel.
+
+        Channels are fetched concurrently but yielded in the order they
+        were requested, so downstream prompts (and any prompt-keyed
+        caching) see the same message order on every run.
+
+        Args:
+            channel_ids: List of Slack channel IDs
+            days: Number of days to look back (default: 7)
+
+        Yields:
+            Messages with their metadata and thread replies
+        """
+        oldest = (datetime.now() - timedelta(days=days)).timestamp()
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_FETCHES)
+        # Resolve the workspace URL once so permalinks build locally
+        await self._get_workspace_url()
+
+        async def _one(channel_id: str) -> List[Dict]:
+            try:
+                return await self._fetch_channel(channel_id, oldest, semaphore)
+            except Exception as e:
+                print(f"Error fetching messages from channel {channel_id}: {e}")
+                return []
+
+        results = await asyncio.gather(*[_one(channel_id) for channel_id in channel_ids])
+        for result in results:
+            for msg in result:
+                yield msg
+
+    async def aget_messages_from_channels(self, channel_ids: List[str], days: int = 7) -> List[Dict]:
+        """
+        Fetch messages and thread replies from all channels concurrently.
+
+        Args:
+            channel_ids: List of Slack channel IDs
+            days: Number of days to look back (default: 7)
+
+        Returns:
+            List of messages with their metadata and thread replies
+        """
+        return [msg async for msg in self.aiter_messages_from_channels(channel_ids, days)]
+
+    def get_messages_from_channels(self, channel_ids: List[str], days: int = 7) -> List[Dict]:
+        """
+        Synchronous wrapper around aget_messages_from_channels.
+
+        Args:
+            channel_ids: List of Slack channel IDs
+            days: Number of days to look back (default: 7)
+
+        Returns:
+            List of messages with their metadata and thread replies
+        """
+        return asyncio.run(self.aget_messages_from_channels(channel_ids, days))
         
+    def _build_email_index(self) -> Dict[str, str]:
+        """
+        Build an email -> user ID index from a paginated users.list walk.
+
+        One walk covers the whole workspace in a few pages, so resolving
+        many emails costs O(pages) round-trips instead of one
+        users.lookupByEmail call each. The index is cached on the
+        instance for an hour.
+
+        Returns:
+            Dict mapping email addresses to Slack user IDs
+        """
+        with self._cache_lock:
+            if self._email_index is not None and time.monotonic() < self._email_index_expiry:
+                return self._email_index
+
+        index = {}
+        cursor = None
+        try:
+            while True:
+                result = self.client.users_list(limit=1000, cursor=cursor)
+                if not result["ok"]:
+                    break
+                for member in result.get("members", []):
+                    if member.get("is_bot") or member.get("deleted"):
+                        continue
+                    member_email = member.get("profile", {}).get("email")
+                    if member_email:
+                        index[member_email] = member["id"]
+                cursor = result.get("response_metadata", {}).get("next_cursor")
+                if not cursor:
+                    break
+        except SlackApiError as e:
+            print(f"Error building email index: {e}")
+
+        with self._cache_lock:
+            self._email_index = index
+            self._email_index_expiry = time.monotonic() + 3600
+        return index
+
+    def resolve_emails(self, emails: List[str]) -> Dict[str, str]:
+        """
+        Resolve a batch of email addresses to Slack user IDs.
+
+        Args:
+            emails: Email addresses to resolve
+
+        Returns:
+            Dict mapping each resolvable email to its Slack user ID
+        """
+        resolved = {}
+        unresolved = []
+        for email in emails:
+            user = get_user_by_email(email)
+            if user and user.get("slack_id"):
+                resolved[email] = user["slack_id"]
+            else:
+                unresolved.append(email)
+        if unresolved:
+            index = self._build_email_index()
+            for email in unresolved:
+                user_id = index.get(email)
+                if user_id:
+                    resolved[email] = user_id
+        return resolved
+
     def get_user_id_by_email(self, email: str) -> Optional[str]:
         """
         Look up a Slack user ID by their email address.
         First checks the USER_MAPPINGS, then falls back to Slack API.
-        
+
         Args:
             email: User's email address
-            
+
         Returns:
             Slack user ID if found, None otherwise
         """
@@ -116,14 +361,34 @@ class SlackClient:
         user = get_user_by_email(email)
         if user:
             return user["slack_id"]
-            
+
+        # A still-fresh users.list index answers without a round-trip
+        with self._cache_lock:
+            if self._email_index is not None and time.monotonic() < self._email_index_expiry:
+                indexed = self._email_index.get(email)
+                if indexed:
+                    return indexed
+
+        # Serve repeat lookups (including recent misses) from cache
+        with self._cache_lock:
+            cached = self._email_id_cache.get(email)
+            if cached is not None:
+                return cached
+            if email in self._email_miss_cache:
+                return None
+
         # Fall back to Slack API
         try:
             result = self.client.users_lookupByEmail(email=email)
             if result["ok"]:
-                return result["user"]["id"]
+                user_id = result["user"]["id"]
+                with self._cache_lock:
+                    self._email_id_cache[email] = user_id
+                return user_id
         except SlackApiError as e:
             print(f"Error looking up user by email {email}: {e}")
+        with self._cache_lock:
+            self._email_miss_cache[email] = True
         return None
         
     def post_suggestion_to_user(self, user_id: str, suggestion: Dict) -> bool:
@@ -141,75 +406,27 @@ class SlackClient:
             # Get user info for personalization
             user = get_user_by_slack_id(user_id)
             greeting = f"Hi {user['slack_name'] if user else 'there'}"
-            
-            blocks = [
-                {
-                    "type": "header",
-                    "text": {
-                        "type": "plain_text",
-                        "text": "🔄 Potential Document Update Needed"
-                    }
-                },
-                {
-                    "type": "section",
-                    "text": {
-                        "type": "mrkdwn",
-                        "text": f"{greeting}! I found a potential update needed in your Notion document."
-                    }
-                },
-                {
-                    "type": "section",
-                    "text": {
-                        "type": "mrkdwn",
-                        "text": f"*Source:* {suggestion['source_message_link']}\n"
-                               f"*Triggering Text:* {suggestion['triggering_text']}"
-                    }
-                },
-                {
-                    "type": "section",
-                    "text": {
-                        "type": "mrkdwn",
-                        "text": f"*Current Text:* {suggestion['conflicting_text']}\n"
-                               f"*Suggested Update:* {suggestion['suggested_edit']}"
-                    }
-                }
-            ]
-            
-            # Add thread context if available
-            if suggestion.get("thread_context"):
-                blocks.append({
-                    "type": "section",
-                    "text": {
-                        "type": "mrkdwn",
-                        "text": f"*Thread Context:* {suggestion['thread_context']}"
-                    }
-                })
-            
-            blocks.extend([
-                {
-                    "type": "section",
-                    "text": {
-                        "type": "mrkdwn",
-                        "text": f"*Reasoning:* {suggestion['reasoning']}\n"
-                               f"*Confidence:* {suggestion['confidence_score']}"
-                    }
-                },
-                {
-                    "type": "actions",
-                    "elements": [
-                        {
-                            "type": "button",
-                            "text": {
-                                "type": "plain_text",
-                                "text": "View in Notion"
-                            },
-                            "url": suggestion["notion_url"],
-                            "style": "primary"
-                        }
-                    ]
-                }
-            ])
-            
+
+            has_thread_context = bool(suggestion.get("thread_context"))
+            blocks = copy.deepcopy(_SUGGESTION_TEMPLATES[has_thread_context])
+            blocks[1]["text"]["text"] = f"{greeting}! I found a potential update needed in your Notion document."
+            blocks[2]["text"]["text"] = (
+                f"*Source:* {suggestion['source_message_link']}\n"
+                f"*Triggering Text:* {suggestion['triggering_text']}"
+            )
+            blocks[3]["text"]["text"] = (
+                f"*Current Text:* {suggestion['conflicting_text']}\n"
+                f"*Suggested Update:* {suggestion['suggested_edit']}"
+            )
+            if has_thread_context:
+                blocks[4]["text"]["text"] = f"*Thread Context:* {suggestion['thread_context']}"
+            blocks[-2]["text"]["text"] = (
+                f"*Reasoning:* {suggestion['reasoning']}\n"
+                f"*Confidence:* {suggestion['confidence_score']}"
+            )
+            blocks[-1]["elements"][0]["url"] = suggestion["notion_url"]
+
+
             result = self.client.chat_postMessage(
                 channel=user_id,
                 blocks=blocks,